@@ -0,0 +1,230 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+from migrations import POSITION_INDEX_V2_SQL, create_summary_triggers, is_compact, migrate
+
+# --- config ---
+DATABASE_FILE = Path("~/IdeaProjects/PolyCopy/db/simulation.db").expanduser()
+
+# optional compact layout for the trades table. `python compact_schema.py` converts
+# simulation.db in place: trades move to trades_v2, which stores epoch-second
+# timestamps, integer ids for wallets, markets and outcomes, side as 0/1 and the
+# tx hash as 32 raw bytes. a view named `trades` rebuilds the original columns,
+# so every existing query keeps working, and instead-of triggers on the view
+# take the inserts, resolution updates and deletes the scripts already issue.
+# the simulator's writer skips the view and inserts into trades_v2 directly.
+
+DIMENSION_TABLES_SQL = [
+    "CREATE TABLE IF NOT EXISTS wallets (id INTEGER PRIMARY KEY, address TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS market_keys (id INTEGER PRIMARY KEY, condition_id TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS outcome_names (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+]
+
+TRADES_V2_TABLE_SQL = '''
+                      CREATE TABLE trades_v2 (
+                                                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                 ts INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+                                                 wallet_id INTEGER NOT NULL REFERENCES wallets (id),
+                                                 market_key INTEGER NOT NULL REFERENCES market_keys (id),
+                                                 outcome_id INTEGER NOT NULL REFERENCES outcome_names (id),
+                                                 side INTEGER,
+                                                 price REAL NOT NULL,
+                                                 simulated_bet REAL NOT NULL,
+                                                 is_resolved INTEGER DEFAULT 0,
+                                                 pnl REAL DEFAULT 0,
+                                                 exchange_ts REAL,
+                                                 received_ts REAL,
+                                                 metadata_ms REAL,
+                                                 detect_latency_ms REAL,
+                                                 copy_latency_ms REAL,
+                                                 tx_hash BLOB
+                      )
+                      '''
+
+# the same access paths as the trades indexes in migrations.py. queries reach trades_v2
+# through the view, where they filter and sort on datetime(ts, 'unixepoch'), so the
+# indexes are built on that expression rather than on ts itself.
+TRADES_V2_INDEXES_SQL = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_trades_v2_tx_wallet ON trades_v2 (tx_hash, wallet_id)",
+    "CREATE INDEX IF NOT EXISTS idx_trades_v2_resolved_ts ON trades_v2 (is_resolved, datetime(ts, 'unixepoch'), pnl)",
+    "CREATE INDEX IF NOT EXISTS idx_trades_v2_wallet ON trades_v2 (wallet_id, is_resolved, datetime(ts, 'unixepoch'), pnl)",
+    "CREATE INDEX IF NOT EXISTS idx_trades_v2_resolved_market ON trades_v2 (is_resolved, market_key)",
+    "CREATE INDEX IF NOT EXISTS idx_trades_v2_ts ON trades_v2 (datetime(ts, 'unixepoch'), simulated_bet)",
+    POSITION_INDEX_V2_SQL,
+]
+
+# question lives in the markets table now; the view keeps the column so old queries still parse.
+# tx hashes that weren't valid hex are kept as text and passed through unchanged.
+TRADES_VIEW_SQL = '''
+                  CREATE VIEW trades AS
+                  SELECT t.id,
+                         datetime(t.ts, 'unixepoch') AS timestamp,
+                         w.address AS whale_wallet,
+                         k.condition_id AS market_id,
+                         NULL AS question,
+                         o.name AS outcome,
+                         CASE t.side WHEN 0 THEN 'BUY' WHEN 1 THEN 'SELL' END AS side,
+                         t.price, t.simulated_bet, t.is_resolved, t.pnl,
+                         t.exchange_ts, t.received_ts, t.metadata_ms, t.detect_latency_ms, t.copy_latency_ms,
+                         CASE WHEN typeof(t.tx_hash) = 'blob' THEN '0x' || lower(hex(t.tx_hash)) ELSE t.tx_hash END AS tx_hash
+                  FROM trades_v2 t
+                           JOIN wallets w ON w.id = t.wallet_id
+                           JOIN market_keys k ON k.id = t.market_key
+                           JOIN outcome_names o ON o.id = t.outcome_id
+                  '''
+
+# inserts through the view come from scripts that don't know about the compact layout
+# (generate_fake_trades.py, ad-hoc sql), so the hash is stored as given.
+TRADES_VIEW_TRIGGERS_SQL = [
+    '''
+    CREATE TRIGGER trades_view_insert INSTEAD OF INSERT ON trades
+    BEGIN
+        INSERT OR IGNORE INTO wallets (address) VALUES (NEW.whale_wallet);
+        INSERT OR IGNORE INTO market_keys (condition_id) VALUES (NEW.market_id);
+        INSERT OR IGNORE INTO outcome_names (name) VALUES (NEW.outcome);
+        INSERT INTO trades_v2 (ts, wallet_id, market_key, outcome_id, side, price, simulated_bet, is_resolved, pnl,
+                               exchange_ts, received_ts, metadata_ms, detect_latency_ms, copy_latency_ms, tx_hash)
+        VALUES (COALESCE(CAST(strftime('%s', NEW.timestamp) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER)),
+                (SELECT id FROM wallets WHERE address = NEW.whale_wallet),
+                (SELECT id FROM market_keys WHERE condition_id = NEW.market_id),
+                (SELECT id FROM outcome_names WHERE name = NEW.outcome),
+                CASE upper(NEW.side) WHEN 'BUY' THEN 0 WHEN 'SELL' THEN 1 END,
+                NEW.price, NEW.simulated_bet, COALESCE(NEW.is_resolved, 0), COALESCE(NEW.pnl, 0),
+                NEW.exchange_ts, NEW.received_ts, NEW.metadata_ms, NEW.detect_latency_ms, NEW.copy_latency_ms,
+                NEW.tx_hash);
+    END
+    ''',
+    # resolution is the only thing that changes once a trade is logged
+    '''
+    CREATE TRIGGER trades_view_update INSTEAD OF UPDATE OF is_resolved, pnl ON trades
+    BEGIN
+        UPDATE trades_v2 SET is_resolved = NEW.is_resolved, pnl = NEW.pnl WHERE id = OLD.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER trades_view_delete INSTEAD OF DELETE ON trades
+    BEGIN
+        DELETE FROM trades_v2 WHERE id = OLD.id;
+    END
+    ''',
+]
+
+# the writer's insert: same parameters, in the same order, as TradeWriter.INSERT_SQL.
+# run intern_trade_keys on the rows first so the id lookups find something.
+COMPACT_INSERT_SQL = '''
+                     INSERT OR IGNORE INTO trades_v2 (ts, wallet_id, market_key, outcome_id, side, price, simulated_bet,
+                                                      exchange_ts, received_ts, metadata_ms, detect_latency_ms, copy_latency_ms, tx_hash)
+                     VALUES (CAST(strftime('%s', ?) AS INTEGER),
+                             (SELECT id FROM wallets WHERE address = ?),
+                             (SELECT id FROM market_keys WHERE condition_id = ?),
+                             (SELECT id FROM outcome_names WHERE name = ?),
+                             CASE upper(?) WHEN 'BUY' THEN 0 WHEN 'SELL' THEN 1 END,
+                             ?, ?, ?, ?, ?, ?, ?, hash_bytes(?))
+                     '''
+
+
+def hash_bytes(value):
+    """'0x' + hex tx hash -> raw bytes. anything that isn't hex is returned unchanged."""
+    if not isinstance(value, str):
+        return value
+    try:
+        return bytes.fromhex(value[2:] if value[:2].lower() == '0x' else value)
+    except ValueError:
+        return value
+
+
+def register_functions(conn):
+    """adds the sql functions the compact inserts and the conversion use to a connection."""
+    conn.create_function('hash_bytes', 1, hash_bytes, deterministic=True)
+
+
+def intern_trade_keys(conn, rows):
+    """
+    adds the wallets, condition ids and outcomes of writer rows (INSERT_SQL
+    order) to the dimension tables. the caller commits.
+    """
+    conn.executemany("INSERT OR IGNORE INTO wallets (address) VALUES (?)", {(row[1],) for row in rows})
+    conn.executemany("INSERT OR IGNORE INTO market_keys (condition_id) VALUES (?)", {(row[2],) for row in rows})
+    conn.executemany("INSERT OR IGNORE INTO outcome_names (name) VALUES (?)", {(row[3],) for row in rows})
+
+
+def compact_database(conn):
+    """
+    converts the trades table to the compact layout in one transaction, keeping
+    trade ids. questions stored on old trade rows are copied into the markets
+    table first. returns the number of trades converted, or none if the
+    database was already compact.
+    """
+    migrate(conn)
+    if is_compact(conn):
+        return None
+    register_functions(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute('''
+                     INSERT INTO markets (condition_id, question)
+                     SELECT market_id, MAX(question) FROM trades WHERE question IS NOT NULL GROUP BY market_id
+                         ON CONFLICT(condition_id) DO UPDATE SET question = COALESCE(markets.question, excluded.question)
+                     ''')
+        for statement in DIMENSION_TABLES_SQL:
+            conn.execute(statement)
+        conn.execute("INSERT OR IGNORE INTO wallets (address) SELECT DISTINCT whale_wallet FROM trades")
+        conn.execute("INSERT OR IGNORE INTO market_keys (condition_id) SELECT DISTINCT market_id FROM trades")
+        conn.execute("INSERT OR IGNORE INTO outcome_names (name) SELECT DISTINCT outcome FROM trades")
+
+        conn.execute(TRADES_V2_TABLE_SQL)
+        conn.execute('''
+                     INSERT INTO trades_v2 (id, ts, wallet_id, market_key, outcome_id, side, price, simulated_bet,
+                                            is_resolved, pnl, exchange_ts, received_ts, metadata_ms,
+                                            detect_latency_ms, copy_latency_ms, tx_hash)
+                     SELECT t.id, CAST(strftime('%s', t.timestamp) AS INTEGER), w.id, k.id, o.id,
+                            CASE upper(t.side) WHEN 'BUY' THEN 0 WHEN 'SELL' THEN 1 END,
+                            t.price, t.simulated_bet, t.is_resolved, t.pnl, t.exchange_ts, t.received_ts,
+                            t.metadata_ms, t.detect_latency_ms, t.copy_latency_ms, hash_bytes(t.tx_hash)
+                     FROM trades t
+                              JOIN wallets w ON w.address = t.whale_wallet
+                              JOIN market_keys k ON k.condition_id = t.market_id
+                              JOIN outcome_names o ON o.name = t.outcome
+                     ''')
+        count = conn.execute("SELECT COUNT(*) FROM trades_v2").fetchone()[0]
+        # keep handing out ids after the old table's, even if its newest rows were deleted
+        conn.execute('''
+                     UPDATE sqlite_sequence SET seq = MAX(seq, COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'trades'), 0))
+                     WHERE name = 'trades_v2'
+                     ''')
+
+        conn.execute("DROP TABLE trades")
+        conn.execute(TRADES_VIEW_SQL)
+        for statement in TRADES_VIEW_TRIGGERS_SQL + TRADES_V2_INDEXES_SQL:
+            conn.execute(statement)
+        # the summary triggers went with the old table; put them on trades_v2
+        create_summary_triggers(conn)
+        conn.execute("ANALYZE")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return count
+
+
+def main():
+    """python compact_schema.py [simulation.db] -- converts the trades table to the compact layout"""
+    db_file = Path(sys.argv[1]).expanduser() if len(sys.argv) > 1 else DATABASE_FILE
+    db_file.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_file)
+    before = db_file.stat().st_size
+    count = compact_database(conn)
+    if count is None:
+        print(f"'{db_file}' already uses the compact trades layout.")
+        conn.close()
+        return
+    # hand the freed pages back to the filesystem
+    conn.execute("VACUUM")
+    conn.close()
+    after = db_file.stat().st_size
+    print(f"converted {count} trades in '{db_file}': {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB.")
+
+
+if __name__ == "__main__":
+    main()
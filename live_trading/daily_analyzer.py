@@ -1,15 +1,25 @@
+import argparse
+import heapq
 import requests
+import numpy as np
 import pandas as pd
 import sqlite3
 import os
 import sys
 import json
 import time
-from datetime import datetime, timedelta
+import random
+import concurrent.futures
+from datetime import datetime, timedelta, timezone
+from threading import Lock
 from dotenv import load_dotenv
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from market_store import load_markets, upsert_markets
+from pnl import is_buy, settlement_prices, trade_pnl
+from migrations import migrate
 
 # --- config ---
 load_dotenv()
@@ -17,113 +27,209 @@ load_dotenv()
 
 DATABASE_FILE = Path("~/IdeaProjects/PolyCopy/db/simulation.db").expanduser()
 GRAPH_FILE = "pnl_over_time.png"
+DB_CACHE_SIZE_MB = 64  # page cache for bulk resolution updates, which touch every trades index
 
 
 DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
 MARKETS_URL = "https://gamma-api.polymarket.com/markets"
 BATCH_SIZE = 50  # how many markets to query the api for at once
+MAX_CONCURRENT_BATCHES = 8  # batches in flight at once (also the http connection pool size)
+MAX_REQUESTS_PER_SECOND = 10  # shared by all batches
+MAX_RETRIES = 3  # extra attempts per batch on connection errors, timeouts, 429 and 5xx
+RETRY_BASE_DELAY = 0.5  # seconds; doubles per attempt, with jitter
+
+# resolution checks are scheduled per market from its endDate instead of polling every open market
+RESOLUTION_GRACE = 5 * 60  # first check this long after endDate
+RECHECK_BASE_DELAY = 10 * 60  # wait after a check that found the market ended but unresolved; doubles per attempt
+RECHECK_MAX_DELAY = 6 * 3600
+MAX_WAIT_BEFORE_END = 7 * 86400  # markets can resolve early, so check at least this often before endDate
+DAEMON_RESCAN_INTERVAL = 60  # how often the daemon looks for markets with new open trades
 
 # --- 1. Database & API Functions ---
 
+class RateLimiter:
+    """
+    spaces calls at least 1/rate seconds apart across all threads. each caller
+    reserves the next free slot under the lock, then sleeps outside it.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._lock = Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+api_session = requests.Session()
+api_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENT_BATCHES))
+api_rate_limiter = RateLimiter(MAX_REQUESTS_PER_SECOND)
+
 def get_db_connection():
     """establishes a connection to the sqlite database."""
     try:
         conn = sqlite3.connect(DATABASE_FILE)
         conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_MB * 1024}")
+        migrate(conn)
         return conn
     except sqlite3.Error as e:
         print(f"error connecting to database: {e}")
         sys.exit(1)
 
-def get_unresolved_trades(conn):
+def get_unresolved_trades(conn, market_ids):
     """
-    fetches all trades from the database that have not been
-    resolved yet (is_resolved = 0).
+    fetches the trades in the given markets that have not been resolved yet
+    (is_resolved = 0), with only the columns settling needs. the market ids
+    are loaded into a temp table, so any number of them is one indexed join.
     """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS resolved_markets (market_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM resolved_markets")
+    conn.executemany("INSERT OR IGNORE INTO resolved_markets (market_id) VALUES (?)", ((m,) for m in market_ids))
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM trades WHERE is_resolved = 0")
+    cursor.execute('''
+                   SELECT t.id, t.market_id, t.outcome, t.side, t.price, t.simulated_bet
+                   FROM resolved_markets r
+                            JOIN trades t ON t.market_id = r.market_id AND t.is_resolved = 0
+                   ''')
     return cursor.fetchall()
 
-def fetch_market_results(market_ids):
+def get_market_result(market):
+    """
+    returns {"outcomes", "final_prices"} if a market (api or markets-table shape)
+    is resolved with parseable final prices, otherwise none.
+    """
+    # check multiple ways a market can be resolved
+    resolution_status = market.get('umaResolutionStatus')
+    closed = market.get('closed', False)
+
+    # check if market is closed/resolved
+    is_resolved = False
+    if resolution_status:
+        # check for various resolution statuses
+        if resolution_status.upper() in ['FINAL', 'RESOLVED', 'RESOLVED_FINAL']:
+            is_resolved = True
+    elif closed:
+        # if market is closed, check if it has final prices
+        prices_data = market.get('outcomePrices')
+        if prices_data:
+            # try to parse and check if sum is close to 1 (resolved)
+            try:
+                if isinstance(prices_data, list):
+                    prices_sum = sum([float(p) if p else 0.0 for p in prices_data])
+                elif isinstance(prices_data, str):
+                    prices_list = json.loads(prices_data)
+                    prices_sum = sum([float(p) if p else 0.0 for p in prices_list])
+                else:
+                    prices_sum = 0
+
+                if prices_sum > 0.99:  # market is resolved if prices sum to ~1
+                    is_resolved = True
+            except:
+                pass
+
+    if not is_resolved:
+        return None
+
+    # parse the data
+    outcomes, final_prices = parse_market_data(market)
+    if not (outcomes and final_prices):
+        print(f"  -> market {market.get('conditionId', '')[:8]}... is resolved but could not parse data")
+        return None
+    return {
+        "outcomes": json.loads(outcomes),
+        "final_prices": json.loads(final_prices)
+    }
+
+def get_stored_market_results(conn, market_ids):
+    """
+    returns results for the markets the markets table already has as resolved.
+    resolution is final, so these never need another api call.
+    """
+    results = {}
+    for condition_id, market in load_markets(conn, market_ids).items():
+        market_result = get_market_result(market)
+        if market_result:
+            results[condition_id] = market_result
+    print(f"found {len(results)} resolved markets already in the markets table.")
+    return results
+
+def fetch_market_batch(batch_ids):
+    """
+    fetches one batch of markets by condition id and parses the response.
+    retries connection errors, timeouts, 429 and 5xx with jittered exponential
+    backoff; other errors are raised. returns the list of markets.
+    """
+    params = {'condition_ids': ",".join(batch_ids)}
+    for attempt in range(MAX_RETRIES + 1):
+        api_rate_limiter.wait()
+        try:
+            response = api_session.get(MARKETS_URL, params=params, timeout=10)
+            if response.status_code == 429 or response.status_code >= 500:
+                response.raise_for_status()
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"  -> retrying batch in {delay:.1f}s after: {e}")
+            time.sleep(delay)
+            continue
+        response.raise_for_status()
+        return response.json()
+
+def fetch_market_results(market_ids, conn=None):
     """
     fetches the resolution data for a *specific list*
-    of market ids from the polymarket api.
+    of market ids from the polymarket api. with conn, every market
+    returned is also upserted into the markets table.
+
+    batches are fetched concurrently (MAX_CONCURRENT_BATCHES at a time, rate
+    limited together) and handled here as each one arrives; the database
+    work stays on this thread.
     """
     print(f"fetching results for {len(market_ids)} specific markets from api...")
     results = {}
 
     # we must query in batches, as the api may have a url length limit
-    for i in range(0, len(market_ids), BATCH_SIZE):
-        batch_ids = market_ids[i : i + BATCH_SIZE]
-        id_string = ",".join(batch_ids)
+    batches = {i: market_ids[i : i + BATCH_SIZE] for i in range(0, len(market_ids), BATCH_SIZE)}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENT_BATCHES) as executor:
+        futures = {executor.submit(fetch_market_batch, batch_ids): i for i, batch_ids in batches.items()}
+        for future in concurrent.futures.as_completed(futures):
+            i = futures[future]
+            batch_ids = set(batches[i])
+            try:
+                markets_data = future.result()
+
+                if not isinstance(markets_data, list):
+                    print(f"error: api did not return a list for batch {i}. response: {markets_data}")
+                    continue
 
-        try:
-            # use the 'condition_ids' parameter to get *only* the markets we need
-            params = {
-                'condition_ids': id_string
-            }
-            response = requests.get(MARKETS_URL, params=params, timeout=10)
-            response.raise_for_status()
-            markets_data = response.json()
+                print(f"batch {i}: received {len(markets_data)} markets from api")
 
-            if not isinstance(markets_data, list):
-                print(f"error: api did not return a list for batch {i}. response: {markets_data}")
-                continue
+                if conn is not None:
+                    upsert_markets(conn, markets_data)
+                    conn.commit()
 
-            print(f"batch {i}: received {len(markets_data)} markets from api")
+                for market in markets_data:
+                    condition_id = market.get('conditionId')
+                    if not condition_id or condition_id not in batch_ids:
+                        continue
 
-            for market in markets_data:
-                condition_id = market.get('conditionId')
-                if not condition_id:
-                    continue
-                
-                # check multiple ways a market can be resolved
-                resolution_status = market.get('umaResolutionStatus')
-                closed = market.get('closed', False)
-                
-                # check if market is closed/resolved
-                is_resolved = False
-                if resolution_status:
-                    # check for various resolution statuses
-                    if resolution_status.upper() in ['FINAL', 'RESOLVED', 'RESOLVED_FINAL']:
-                        is_resolved = True
-                elif closed:
-                    # if market is closed, check if it has final prices
-                    prices_data = market.get('outcomePrices')
-                    if prices_data:
-                        # try to parse and check if sum is close to 1 (resolved)
-                        try:
-                            if isinstance(prices_data, list):
-                                prices_sum = sum([float(p) if p else 0.0 for p in prices_data])
-                            elif isinstance(prices_data, str):
-                                prices_list = json.loads(prices_data)
-                                prices_sum = sum([float(p) if p else 0.0 for p in prices_list])
-                            else:
-                                prices_sum = 0
-                            
-                            if prices_sum > 0.99:  # market is resolved if prices sum to ~1
-                                is_resolved = True
-                        except:
-                            pass
-
-                if condition_id in batch_ids and is_resolved:
-                    # parse the data
-                    outcomes, final_prices = parse_market_data(market)
-                    if outcomes and final_prices:
-                        results[condition_id] = {
-                            "outcomes": json.loads(outcomes),
-                            "final_prices": json.loads(final_prices)
-                        }
-                        print(f"  -> found resolved market: {condition_id[:8]}... (status: {resolution_status}, closed: {closed})")
-                    else:
-                        print(f"  -> market {condition_id[:8]}... is resolved but could not parse data")
-
-            time.sleep(0.2)  # rate limit
-
-        except Exception as e:
-            print(f"error fetching market results for batch {i}: {e}")
-            import traceback
-            traceback.print_exc()
+                    market_result = get_market_result(market)
+                    if market_result:
+                        results[condition_id] = market_result
+                        print(f"  -> found resolved market: {condition_id[:8]}... (status: {market.get('umaResolutionStatus')}, closed: {market.get('closed', False)})")
+
+            except Exception as e:
+                print(f"error fetching market results for batch {i}: {e}")
+                import traceback
+                traceback.print_exc()
 
     print(f"found results for {len(results)} newly resolved markets.")
     return results
@@ -180,57 +286,23 @@ def parse_market_data(market_row):
         print(f"error parsing market data: {e}")
         return None, None
 
-def calculate_pnl(trade, market_result):
-    """
-    calculates the p&l for a single simulated trade.
-    """
-    try:
-        trade_outcome = str(trade['outcome']).upper()
-        outcomes_upper = [str(o).upper() for o in market_result['outcomes']]
-
-        if trade_outcome not in outcomes_upper:
-            print(f"warning: trade outcome '{trade_outcome}' not found in market outcomes: {outcomes_upper}")
-            return 0
-
-        trade_index = outcomes_upper.index(trade_outcome)
-        settlement_price = market_result['final_prices'][trade_index]
-
-        purchase_price = float(trade['price'])
-        bet_amount = float(trade['simulated_bet'])
-
-        if str(trade['side']).upper() == 'BUY':
-            if purchase_price == 0:
-                return 0
-            shares_bought = bet_amount / purchase_price
-            value_at_settlement = shares_bought * settlement_price
-            pnl = value_at_settlement - bet_amount
-        else:  # SELL
-            if (1 - purchase_price) == 0:
-                return 0
-            shares_shorted = bet_amount / (1 - purchase_price)
-            payout_at_settlement = shares_shorted * (1 - settlement_price)
-            pnl = payout_at_settlement - bet_amount
-
-        return pnl
-
-    except Exception as e:
-        print(f"error calculating pnl: {e}")
-        import traceback
-        traceback.print_exc()
-        return 0
-
 def update_database(conn, trades_to_update, today_pnl):
     """
-    updates trades to 'is_resolved=1' and logs daily p&l.
+    updates trades to 'is_resolved=1' and logs daily p&l, in one transaction.
+    the (trade_id, pnl) pairs are loaded into a temp table and applied with a
+    single UPDATE ... FROM join instead of one statement per trade.
     """
     cursor = conn.cursor()
 
-    for trade_id, pnl in trades_to_update:
-        cursor.execute('''
-                       UPDATE trades
-                       SET is_resolved = 1, pnl = ?
-                       WHERE id = ?
-                       ''', (pnl, trade_id))
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS settled_trades (id INTEGER PRIMARY KEY, pnl REAL NOT NULL)")
+    cursor.execute("DELETE FROM settled_trades")
+    cursor.executemany("INSERT INTO settled_trades (id, pnl) VALUES (?, ?)", trades_to_update)
+    cursor.execute('''
+                   UPDATE trades
+                   SET is_resolved = 1, pnl = s.pnl
+                   FROM settled_trades s
+                   WHERE trades.id = s.id
+                   ''')
 
     print(f"updated {len(trades_to_update)} trades as 'resolved' in database.")
 
@@ -251,6 +323,141 @@ def update_database(conn, trades_to_update, today_pnl):
     conn.commit()
     print(f"updated p&l history for {today_str}. new total p&l: ${new_cumulative_pnl:.2f}")
 
+# --- resolution scheduling ---
+
+def parse_end_date(end_date):
+    """endDate from the api ('2025-11-04T12:00:00Z' or a bare date) -> epoch seconds, or none."""
+    if not end_date:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(end_date).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def first_check_time(end_date, closed, now):
+    """
+    when to first ask the api about an open market: right away if its endDate
+    is unknown or the simulator has already seen it close, otherwise just after
+    endDate (but within MAX_WAIT_BEFORE_END, since markets can resolve early).
+    """
+    end_ts = parse_end_date(end_date)
+    if closed or end_ts is None:
+        return now
+    return min(end_ts + RESOLUTION_GRACE, now + MAX_WAIT_BEFORE_END)
+
+def recheck_time(end_date, closed, attempts, now):
+    """
+    after a check that found the market unresolved: returns (due_at, attempts).
+    markets that haven't ended wait for endDate again; ended ones back off from
+    RECHECK_BASE_DELAY, doubling per attempt, up to RECHECK_MAX_DELAY, while
+    uma resolution is pending.
+    """
+    end_ts = parse_end_date(end_date)
+    if not closed and end_ts is not None and now < end_ts + RESOLUTION_GRACE:
+        return first_check_time(end_date, closed, now), 0
+    attempts += 1
+    return now + min(RECHECK_BASE_DELAY * 2 ** (attempts - 1), RECHECK_MAX_DELAY), attempts
+
+# schedule-only rows (markets the simulator never stored) get no updated_at, so the
+# simulator's warm-up doesn't take them for freshly fetched markets
+SCHEDULE_UPSERT_SQL = '''
+                      INSERT INTO markets (condition_id, next_check_at, check_attempts, updated_at) VALUES (?, ?, ?, NULL)
+                          ON CONFLICT(condition_id) DO UPDATE SET next_check_at = excluded.next_check_at,
+                                                                  check_attempts = excluded.check_attempts
+                      '''
+
+def get_check_schedule(conn):
+    """
+    returns [(due_at, market_id)] for every market with open trades. markets
+    never scheduled before get their first check time from endDate, and it is
+    stored, so the MAX_WAIT_BEFORE_END limit counts from the first time the
+    market was seen rather than moving forward with every run.
+    """
+    now = time.time()
+    rows = conn.execute('''
+                        SELECT o.market_id, m.end_date, m.closed, m.next_check_at
+                        FROM (SELECT DISTINCT market_id FROM trades WHERE is_resolved = 0) o
+                                 LEFT JOIN markets m ON m.condition_id = o.market_id
+                        ''').fetchall()
+    schedule = []
+    first_checks = []
+    for market_id, end_date, closed, next_check_at in rows:
+        if next_check_at is None:
+            next_check_at = first_check_time(end_date, closed, now)
+            first_checks.append((market_id, next_check_at, 0))
+        schedule.append((next_check_at, market_id))
+    if first_checks:
+        conn.executemany(SCHEDULE_UPSERT_SQL, first_checks)
+        conn.commit()
+    return schedule
+
+def reschedule_unresolved(conn, market_ids):
+    """
+    records the next check for markets that were just checked and are still
+    unresolved, using the endDate the check stored. returns {market_id: due_at}.
+    """
+    now = time.time()
+    stored = load_markets(conn, market_ids)
+    attempts = {}
+    for i in range(0, len(market_ids), 500):
+        chunk = market_ids[i : i + 500]
+        attempts.update(conn.execute(
+            f"SELECT condition_id, check_attempts FROM markets WHERE condition_id IN ({','.join('?' * len(chunk))})",
+            chunk).fetchall())
+
+    schedule = {}
+    rows = []
+    for market_id in market_ids:
+        market = stored.get(market_id, {})
+        due_at, tries = recheck_time(market.get('endDate'), market.get('closed', False),
+                                     attempts.get(market_id) or 0, now)
+        schedule[market_id] = due_at
+        rows.append((market_id, due_at, tries))
+    conn.executemany(SCHEDULE_UPSERT_SQL, rows)
+    conn.commit()
+    return schedule
+
+def check_markets(conn, market_ids):
+    """
+    checks the given markets for resolution, settles their open trades, and
+    schedules the next check for the ones still unresolved.
+    returns (p&l settled, {market_id: next due_at}).
+    """
+    # resolved markets we already know about skip the api entirely
+    market_results = get_stored_market_results(conn, market_ids)
+    remaining_ids = [m for m in market_ids if m not in market_results]
+    if remaining_ids:
+        market_results.update(fetch_market_results(remaining_ids, conn))
+    schedule = reschedule_unresolved(conn, [m for m in remaining_ids if m not in market_results])
+
+    if not market_results:
+        print("no new markets were resolved. nothing to update.")
+        print("note: markets may still be open, or api may not have returned resolution data.")
+        return 0, schedule
+
+    trades = get_unresolved_trades(conn, market_results)
+    trade_ids, market_ids, outcomes, sides, prices, bets = zip(*trades) if trades else ((),) * 6
+    settlement = settlement_prices(market_ids, outcomes, market_results)
+    for i in np.flatnonzero(np.isnan(settlement)):
+        outcomes_upper = [str(o).upper() for o in market_results[market_ids[i]]['outcomes']]
+        print(f"warning: trade outcome '{str(outcomes[i]).upper()}' not found in market outcomes: {outcomes_upper}")
+    pnls = trade_pnl(is_buy(sides), prices, bets, settlement)
+
+    trades_to_update = list(zip(trade_ids, pnls.tolist()))  # (trade_id, pnl)
+    settled_pnl = float(pnls.sum())
+
+    print(f"calculated p&l for {len(trades_to_update)} newly resolved trades.")
+    print(f"total p&l settled: ${settled_pnl:+.2f}")
+
+    if trades_to_update:
+        update_database(conn, trades_to_update, settled_pnl)
+    else:
+        print("warning: market_results found but no trades matched. check market_id matching.")
+    return settled_pnl, schedule
+
 # --- 2. Reporting & Graphing Functions ---
 
 def get_pnl_history(conn):
@@ -302,10 +509,9 @@ def get_report_stats(conn, today_pnl):
     total_pnl = total_pnl_row['cumulative_pnl'] if total_pnl_row else 0
 
     cursor.execute('''
-                   SELECT whale_wallet, SUM(pnl) as total_pnl
-                   FROM trades
-                   WHERE is_resolved = 1
-                   GROUP BY whale_wallet
+                   SELECT whale_wallet, resolved_pnl as total_pnl
+                   FROM whale_stats
+                   WHERE resolved_count > 0
                    ORDER BY total_pnl DESC
                        LIMIT 5
                    ''')
@@ -387,57 +593,98 @@ def post_to_discord(today_pnl, total_pnl, top_whales_report, graph_generated):
         if hasattr(response, 'text'):
             print(f"discord api response: {response.text}")
 
+def send_daily_report(conn, today_pnl):
+    """graphs the p&l history and posts the summary to discord."""
+    pnl_df = get_pnl_history(conn)
+    graph_generated = generate_pnl_graph(pnl_df)
+
+    total_pnl, top_whales_report = get_report_stats(conn, today_pnl)
+
+    post_to_discord(today_pnl, total_pnl, top_whales_report, graph_generated)
+
 # --- 3. Main Execution ---
 
+def run_daemon(conn):
+    """
+    keeps a min-heap of (next check time, market) for every market with open
+    trades and checks each one when it comes due, so trades settle minutes
+    after resolution. new markets are picked up every DAEMON_RESCAN_INTERVAL,
+    and the daily report goes out when the date rolls over.
+    """
+    heap = []
+    scheduled = set()
+    next_rescan = 0
+    report_date = datetime.now().date()
+    day_pnl = 0
+
+    while True:
+        now = time.time()
+        if now >= next_rescan:
+            for due_at, market_id in get_check_schedule(conn):
+                if market_id not in scheduled:
+                    heapq.heappush(heap, (due_at, market_id))
+                    scheduled.add(market_id)
+            next_rescan = now + DAEMON_RESCAN_INTERVAL
+
+        due = []
+        while heap and heap[0][0] <= now:
+            due.append(heapq.heappop(heap)[1])
+        if due:
+            scheduled.difference_update(due)
+            print(f"--- checking {len(due)} due markets ({datetime.now().isoformat()}), {len(heap)} waiting ---")
+            settled_pnl, schedule = check_markets(conn, due)
+            day_pnl += settled_pnl
+            for market_id, due_at in schedule.items():
+                heapq.heappush(heap, (due_at, market_id))
+                scheduled.add(market_id)
+
+        if datetime.now().date() != report_date:
+            send_daily_report(conn, day_pnl)
+            report_date = datetime.now().date()
+            day_pnl = 0
+
+        wake_at = min(next_rescan, heap[0][0]) if heap else next_rescan
+        time.sleep(max(0.0, wake_at - time.time()))
+
 def main():
+    parser = argparse.ArgumentParser(description="settles simulated trades on resolved markets and posts the daily report.")
+    parser.add_argument("--daemon", action="store_true",
+                        help="run continuously, checking each market when it is due instead of once a day")
+    parser.add_argument("--all", action="store_true",
+                        help="check every open market now, ignoring the schedule")
+    args = parser.parse_args()
+
     print(f"--- running daily analyzer ({datetime.now().isoformat()}) ---")
     conn = get_db_connection()
 
-    unresolved_trades = get_unresolved_trades(conn)
+    if args.daemon:
+        try:
+            run_daemon(conn)
+        except KeyboardInterrupt:
+            print("--- daemon stopped. ---")
+        finally:
+            conn.close()
+        return
+
+    schedule = get_check_schedule(conn)
 
-    if not unresolved_trades:
+    if not schedule:
         print("no unresolved trades found in database. nothing to do.")
         today_pnl = 0
     else:
-        print(f"found {len(unresolved_trades)} unresolved trades.")
-        market_ids = list(set([t['market_id'] for t in unresolved_trades]))
-        print(f"checking {len(market_ids)} unique markets for resolution...")
-
-        market_results = fetch_market_results(market_ids)
-
-        if not market_results:
-            print("no new markets were resolved. nothing to update.")
-            print("note: markets may still be open, or api may not have returned resolution data.")
-            today_pnl = 0
+        now = time.time()
+        market_ids = [m for due_at, m in schedule if args.all or due_at <= now]
+        print(f"found {len(schedule)} markets with unresolved trades; {len(market_ids)} are due for a check.")
+        if market_ids:
+            print(f"checking {len(market_ids)} unique markets for resolution...")
+            today_pnl, _ = check_markets(conn, market_ids)
         else:
-            trades_to_update = []  # (trade_id, pnl)
             today_pnl = 0
 
-            for trade in unresolved_trades:
-                if trade['market_id'] in market_results:
-                    market_result = market_results[trade['market_id']]
-                    pnl = calculate_pnl(trade, market_result)
-
-                    trades_to_update.append((trade['id'], pnl))
-                    today_pnl += pnl
-
-            print(f"calculated p&l for {len(trades_to_update)} newly resolved trades.")
-            print(f"today's total p&l: ${today_pnl:+.2f}")
-
-            if trades_to_update:
-                update_database(conn, trades_to_update, today_pnl)
-            else:
-                print("warning: market_results found but no trades matched. check market_id matching.")
-
-    pnl_df = get_pnl_history(conn)
-    graph_generated = generate_pnl_graph(pnl_df)
-
-    total_pnl, top_whales_report = get_report_stats(conn, today_pnl)
-
-    post_to_discord(today_pnl, total_pnl, top_whales_report, graph_generated)
+    send_daily_report(conn, today_pnl)
 
     conn.close()
     print("--- daily analysis complete. ---")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
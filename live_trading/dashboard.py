@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 import sqlite3
-import os
 import sys
 import subprocess
 import plotly.express as px
@@ -9,14 +8,17 @@ import plotly.graph_objects as go
 from pathlib import Path
 import json
 import time # 
+from market_store import MARKETS_FILE, import_market_groups
+from migrations import migrate
 
 # --- config ---
 # file paths. gotta use expanduser() to handle the '~'
 WHALE_REPORT_FILE = Path("~/IdeaProjects/PolyCopy/modules/scalar_analysis/whale_report.csv").expanduser()
 DATABASE_FILE = Path("~/IdeaProjects/PolyCopy/db/simulation.db").expanduser()
-MARKETS_FILE = Path("~/IdeaProjects/PolyCopy/preprocessing/scalar_trading/markets_with_groups_v2.csv").expanduser()
 ANALYZER_SCRIPT_PATH = "daily_analyzer.py" # assumes it's in the same folder
 SIMULATOR_LOG_FILE = Path("~/IdeaProjects/PolyCopy/logs/simulator.log").expanduser()
+POSITIONS_PAGE_SIZE = 20 # rows per page in the open/closed position tables
+TOKEN_CACHE_ENTRIES = 4 # results kept per token-keyed loader; only the newest token is read again
 
 # --- styling ---
 st.set_page_config(layout="wide", page_title="Whale Watcher Dashboard")
@@ -218,53 +220,88 @@ def get_db_connection():
     try:
         conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False)
         conn.row_factory = sqlite3.Row
+        migrate(conn)
+        import_groups_if_missing(conn)
         return conn
     except sqlite3.Error as e:
         st.error(f"Error connecting to database: {e}")
         return None
 
-@st.cache_data
-def load_market_names():
-    """loads just the market ids and questions from the v2 file."""
-    if not os.path.exists(MARKETS_FILE):
-        st.error(f"Market file not found: {MARKETS_FILE}")
-        return pd.DataFrame(columns=['conditionId', 'question'])
+def import_groups_if_missing(conn):
+    """
+    the p&l by market group chart needs the groups in the markets table; on a
+    database that has none yet, import them from the default groups file
+    (same as running market_store.py) if it's there.
+    """
+    if conn.execute("SELECT 1 FROM markets WHERE market_group IS NOT NULL LIMIT 1").fetchone():
+        return
+    if not MARKETS_FILE.exists():
+        return
     try:
-        markets_df = pd.read_csv(MARKETS_FILE)[['conditionId', 'question']]
-        return markets_df
+        import_market_groups(conn)
     except Exception as e:
-        st.error(f"Error loading market names: {e}")
-        return pd.DataFrame(columns=['conditionId', 'question'])
+        conn.rollback()
+        st.warning(f"Could not import market groups from '{MARKETS_FILE}': {e}")
+
+# the loaders below take a change token as their first argument, so st.cache_data
+# recomputes one only when the data it reads has changed. tokens come from the small
+# trigger-maintained summary tables, never from a scan of trades or markets, and are
+# only recomputed when PRAGMA data_version says another connection has committed since
+# the last rerun, so an idle dashboard costs one pragma per refresh. every new token
+# is a new cache key, so the loaders keep only the last TOKEN_CACHE_ENTRIES results.
+CHANGE_TOKEN_QUERIES = {
+    # new trades (the simulator, all day long)
+    'trades': "SELECT TOTAL(trade_count), TOTAL(invested) FROM pnl_rollup",
+    # settled trades (the daily analyzer); the p&l charts only need this one
+    'resolutions': "SELECT TOTAL(resolved_count), TOTAL(realized_pnl) FROM pnl_rollup",
+    # questions and groups the tables show (bumped by triggers, see migrations.py)
+    'markets': "SELECT version FROM change_counters WHERE name = 'markets'",
+}
+
+def get_change_tokens():
+    """returns {name: token} for CHANGE_TOKEN_QUERIES; a token changes when what it covers does."""
+    conn = get_db_connection()
+    if not conn:
+        return {name: None for name in CHANGE_TOKEN_QUERIES}
+    try:
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        cached = st.session_state.get('change_tokens')
+        if cached and cached[0] == data_version:
+            return cached[1]
+        tokens = {name: tuple(conn.execute(query).fetchone()) for name, query in CHANGE_TOKEN_QUERIES.items()}
+        st.session_state.change_tokens = (data_version, tokens)
+        return tokens
+    except sqlite3.Error as e:
+        st.error(f"Error checking database for changes: {e}")
+        # a fresh token every time, so nothing stale is served while the check is failing
+        return {name: time.time() for name in CHANGE_TOKEN_QUERIES}
 
-@st.cache_data
-def load_pnl_history():
-    """builds daily cumulative p&l time series from resolved trades."""
+@st.cache_data(max_entries=TOKEN_CACHE_ENTRIES)
+def load_pnl_history(resolutions_token):
+    """builds daily cumulative p&l time series from the pnl_rollup table."""
     conn = get_db_connection()
     if conn:
         try:
-            # build per-day realized pnl from resolved trades
-            trades_df = pd.read_sql_query("""
-                SELECT timestamp, pnl
-                FROM trades
-                WHERE is_resolved = 1
+            # per-day realized pnl, summed over market groups
+            daily_pnl = pd.read_sql_query("""
+                SELECT day, SUM(realized_pnl) AS pnl
+                FROM pnl_rollup
+                GROUP BY day
+                HAVING SUM(resolved_count) > 0
+                ORDER BY day
             """, conn)
-            if trades_df.empty:
+            if daily_pnl.empty:
                 return pd.DataFrame(columns=['timestamp', 'cumulative_pnl'])
 
-            trades_df['timestamp'] = pd.to_datetime(trades_df['timestamp'])
-            trades_df['pnl'] = pd.to_numeric(trades_df['pnl'], errors='coerce').fillna(0.0)
-            trades_df['date'] = trades_df['timestamp'].dt.date
-
-            daily_pnl = trades_df.groupby('date', as_index=False)['pnl'].sum().sort_values('date')
             daily_pnl['cumulative_pnl'] = daily_pnl['pnl'].cumsum()
-            daily_pnl['timestamp'] = pd.to_datetime(daily_pnl['date'])
+            daily_pnl['timestamp'] = pd.to_datetime(daily_pnl['day'])
             return daily_pnl[['timestamp', 'cumulative_pnl']]
         except Exception:
             return pd.DataFrame(columns=['timestamp', 'cumulative_pnl'])
     return pd.DataFrame(columns=['timestamp', 'cumulative_pnl'])
 
-@st.cache_data
-def load_roi_history():
+@st.cache_data(max_entries=TOKEN_CACHE_ENTRIES)
+def load_roi_history(trades_token, resolutions_token):
     """calculates cumulative roi (%) over time using daily aggregates.
     
     roi(t) = cumulative_pnl_to_date / cumulative_invested_to_date * 100
@@ -275,28 +312,23 @@ def load_roi_history():
     
     try:
         # cumulative pnl by day (already cumulative in load_pnl_history)
-        pnl_df = load_pnl_history()
+        pnl_df = load_pnl_history(resolutions_token)
         if pnl_df.empty:
             return pd.DataFrame(columns=['timestamp', 'roi_percentage'])
         pnl_df = pnl_df.copy()
         pnl_df['date'] = pd.to_datetime(pnl_df['timestamp']).dt.date
 
         # cumulative invested by day (all trades, regardless of resolution)
-        trades_df = pd.read_sql_query("""
-            SELECT timestamp, simulated_bet 
-            FROM trades
+        daily_invested = pd.read_sql_query("""
+            SELECT day, SUM(invested) AS invested
+            FROM pnl_rollup
+            GROUP BY day
+            HAVING SUM(trade_count) > 0
+            ORDER BY day
         """, conn)
-        if trades_df.empty:
+        if daily_invested.empty:
             return pd.DataFrame(columns=['timestamp', 'roi_percentage'])
-        trades_df['timestamp'] = pd.to_datetime(trades_df['timestamp'])
-        trades_df['date'] = trades_df['timestamp'].dt.date
-
-        daily_invested = (
-            trades_df.groupby('date', as_index=False)['simulated_bet']
-            .sum()
-            .sort_values('date')
-            .rename(columns={'simulated_bet': 'invested'})
-        )
+        daily_invested['date'] = pd.to_datetime(daily_invested['day']).dt.date
         daily_invested['cumulative_invested'] = daily_invested['invested'].cumsum()
 
         # align by date and compute cumulative roi
@@ -315,48 +347,35 @@ def load_roi_history():
         st.error(f"error loading roi history: {e}")
         return pd.DataFrame(columns=['timestamp', 'roi_percentage'])
 
-@st.cache_data
-def load_market_group_pnl():
-    """calculates p&l grouped by market_group."""
+@st.cache_data(max_entries=TOKEN_CACHE_ENTRIES)
+def load_market_group_pnl(resolutions_token, markets_token):
+    """calculates p&l grouped by market_group, from the pnl_rollup table ('' holds ungrouped markets)."""
     conn = get_db_connection()
-
-    if not os.path.exists(MARKETS_FILE):
-        st.error(f"Market file not found: {MARKETS_FILE}")
-        return pd.DataFrame(columns=['market_group', 'total_pnl'])
     if not conn:
-        return pd.DataFrame(columns=['market_group', 'total_pnl'])
+        return pd.DataFrame(columns=['market_group', 'pnl'])
 
     try:
-        trades_df = pd.read_sql_query("SELECT market_id, pnl FROM trades WHERE is_resolved = 1", conn)
-
-        if trades_df.empty:
-            return pd.DataFrame(columns=['market_group', 'total_pnl'])
-
-        full_markets_df = pd.read_csv(MARKETS_FILE)
-
-        trades_with_groups = pd.merge(
-            trades_df,
-            full_markets_df,
-            left_on='market_id',
-            right_on='conditionId'
-        )
-
-        group_pnl = trades_with_groups.groupby('market_group')['pnl'].sum().reset_index()
-        group_pnl = group_pnl.sort_values(by='pnl', ascending=False)
-        return group_pnl
+        query = """
+                SELECT market_group, SUM(realized_pnl) as pnl
+                FROM pnl_rollup
+                WHERE market_group <> ''
+                GROUP BY market_group
+                HAVING SUM(resolved_count) > 0
+                ORDER BY pnl DESC \
+                """
+        return pd.read_sql_query(query, conn)
 
     except Exception as e:
         st.error(f"Error loading market group P&L: {e}")
-        return pd.DataFrame(columns=['market_group', 'total_pnl'])
+        return pd.DataFrame(columns=['market_group', 'pnl'])
 
-@st.cache_data
-def load_open_positions_ticker():
+@st.cache_data(max_entries=TOKEN_CACHE_ENTRIES)
+def load_open_positions_ticker(trades_token, resolutions_token, markets_token):
     """
     fetches all live, unresolved trades for the ticker.
     now returns the ticker html string AND the latest timestamp for toasts.
     """
     conn = get_db_connection()
-    markets_df = load_market_names()
 
     base_text = ""
     latest_timestamp = None
@@ -365,8 +384,16 @@ def load_open_positions_ticker():
         base_text = "database connection error."
     else:
         try:
-            # query includes question from database (now stored directly in trades table)
-            query = "SELECT * FROM trades WHERE is_resolved = 0 ORDER BY timestamp DESC LIMIT 500"
+            # question comes from the markets table (older rows also carry their own copy)
+            query = """
+                    SELECT t.timestamp, t.whale_wallet, t.side, t.price,
+                           COALESCE(m.question, t.question, t.market_id) as question
+                    FROM trades t
+                    LEFT JOIN markets m ON m.condition_id = t.market_id
+                    WHERE t.is_resolved = 0
+                    ORDER BY t.timestamp DESC
+                        LIMIT 500 \
+                    """
             positions_df = pd.read_sql_query(query, conn)
 
             if positions_df.empty:
@@ -375,27 +402,6 @@ def load_open_positions_ticker():
                 # get the timestamp of the *newest* trade for the toast
                 latest_timestamp = pd.to_datetime(positions_df['timestamp']).max()
 
-                # if question is null in database, try to get it from the csv file as fallback
-                if not markets_df.empty:
-                    merged_df = pd.merge(
-                        positions_df,
-                        markets_df,
-                        left_on='market_id',
-                        right_on='conditionId',
-                        how='left',
-                        suffixes=('', '_csv')
-                    )
-                    # use question from database, fallback to csv question, then to market_id
-                    if 'question_csv' in merged_df.columns:
-                        merged_df['question'] = merged_df['question'].fillna(merged_df['question_csv'])
-                    merged_df['question'] = merged_df['question'].fillna(merged_df['market_id'])
-                    # drop the csv question column if it exists
-                    merged_df = merged_df.drop(columns=['question_csv'], errors='ignore')
-                    positions_df = merged_df
-                else:
-                    # if no csv file, use question from db or fallback to market_id
-                    positions_df['question'] = positions_df['question'].fillna(positions_df['market_id'])
-
                 ticker_items = []
                 for _, row in positions_df.iterrows():
                     side_class = "ticker-buy" if row['side'].upper() == 'BUY' else "ticker-sell"
@@ -421,77 +427,102 @@ def load_open_positions_ticker():
 
     return ticker_content, latest_timestamp
 
-@st.cache_data
-def load_positions_as_html(is_resolved=0, limit=500):
+@st.cache_data(max_entries=TOKEN_CACHE_ENTRIES)
+def load_position_filter_options(trades_token, markets_token):
+    """whale wallets and market groups to offer as position table filters."""
+    conn = get_db_connection()
+    if not conn:
+        return [], []
+    try:
+        wallets = [r[0] for r in conn.execute("SELECT whale_wallet FROM whale_stats ORDER BY whale_wallet")]
+        groups = [r[0] for r in conn.execute(
+            "SELECT DISTINCT market_group FROM markets WHERE market_group IS NOT NULL AND market_group <> '' ORDER BY 1")]
+        return wallets, groups
+    except Exception as e:
+        st.error(f"Error loading position filters: {e}")
+        return [], []
+
+@st.cache_data(max_entries=TOKEN_CACHE_ENTRIES)
+def load_positions_page(trades_token, resolutions_token, markets_token, is_resolved, filters, cursor=None,
+                        page_size=POSITIONS_PAGE_SIZE):
     """
-    fetches open (0) or closed (1) positions and returns
-    a styled html table with market questions.
+    fetches one page of open (0) or closed (1) positions, newest first, as a
+    styled html table. filters is a dict of whale, side, market_group,
+    start_date and end_date (each optional). cursor is the (timestamp, id) of
+    the last row of the previous page, none for the first page.
+
+    returns (html, next_cursor); next_cursor is none on the last page. pages
+    seek on the (is_resolved, timestamp, ...) index rather than using OFFSET,
+    so a deep page costs the same as the first, with or without filters.
     """
     conn = get_db_connection()
-    markets_df = load_market_names()
 
     if not conn:
-        return "<p>No data found. Database connection error.</p>"
-
-    # query includes question from database (now stored directly in trades table)
+        return "<p>No data found. Database connection error.</p>", None
+
+    conditions = ["t.is_resolved = ?"]
+    params = [is_resolved]
+    if filters.get('whale'):
+        conditions.append("t.whale_wallet = ?")
+        params.append(filters['whale'])
+    if filters.get('side'):
+        conditions.append("upper(t.side) = ?")
+        params.append(filters['side'])
+    if filters.get('market_group'):
+        # a semi-join probed row by row, so the newest-first walk below isn't replaced by
+        # a sort of every trade in the group's markets
+        conditions.append("EXISTS (SELECT 1 FROM markets g WHERE g.condition_id = t.market_id AND g.market_group = ?)")
+        params.append(filters['market_group'])
+    if filters.get('start_date'):
+        conditions.append("t.timestamp >= ?")
+        params.append(str(filters['start_date']))
+    if filters.get('end_date'):
+        # timestamps are text, so the end day is included by comparing against the next day
+        conditions.append("t.timestamp < date(?, '+1 day')")
+        params.append(str(filters['end_date']))
+    if cursor:
+        # spelled out rather than as a row value, so both layouts seek on timestamp
+        conditions.append("t.timestamp <= ? AND (t.timestamp < ? OR t.id < ?)")
+        params.extend([cursor[0], cursor[0], cursor[1]])
+
+    # question comes from the markets table, falling back to the row's own copy, then the market id
     query = f"""
-        SELECT timestamp, whale_wallet, side, outcome, price, market_id, question, pnl
-        FROM trades 
-        WHERE is_resolved = {is_resolved}
-        ORDER BY timestamp DESC
-        LIMIT {limit}
+        SELECT t.id, t.timestamp, t.whale_wallet, t.side, t.outcome, t.price,
+               COALESCE(m.question, t.question, t.market_id) as question, t.pnl
+        FROM trades t
+        LEFT JOIN markets m ON m.condition_id = t.market_id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY t.timestamp DESC, t.id DESC
+        LIMIT ?
     """
-    df = pd.read_sql_query(query, conn)
+    # one extra row tells us whether there is a next page
+    df = pd.read_sql_query(query, conn, params=params + [page_size + 1])
 
     if df.empty:
+        if cursor or any(filters.values()):
+            return "<p>No positions match these filters.</p>", None
         if is_resolved == 0:
-            return "<p>No open positions are currently being tracked.</p>"
-        else:
-            return "<p>No positions have been resolved yet.</p>"
-
-    # if question is null in database, try to get it from the csv file as fallback
-    if not markets_df.empty:
-        df_merged = pd.merge(
-            df,
-            markets_df,
-            left_on='market_id',
-            right_on='conditionId',
-            how='left',
-            suffixes=('', '_csv')
-        )
-        # use question from database, fallback to csv question, then to market_id
-        if 'question_csv' in df_merged.columns:
-            df_merged['question'] = df_merged['question'].fillna(df_merged['question_csv'])
-        df_merged['question'] = df_merged['question'].fillna(df_merged['market_id'])
-        # drop the csv question column if it exists
-        df_merged = df_merged.drop(columns=['question_csv'], errors='ignore')
-        df = df_merged
-    else:
-        # if no csv file, use question from db or fallback to market_id
-        df['question'] = df['question'].fillna(df['market_id'])
-
-    # helper funcs to style the table cells
-    def style_side(side):
-        s_upper = str(side).upper()
-        return f'<span class="text-{s_upper.lower()}">{s_upper}</span>'
-
-    def style_pnl(pnl):
-        if pnl is None:
-            return "$0.00" # for open positions
-        pnl_num = float(pnl)
-        if pnl_num > 0:
-            return f'<span class="text-buy">${pnl_num:+.2f}</span>'
-        elif pnl_num < 0:
-            return f'<span class="text-sell">${pnl_num:+.2f}</span>'
+            return "<p>No open positions are currently being tracked.</p>", None
         else:
-            return f'${pnl_num:.2f}'
-
-    df['side'] = df['side'].apply(style_side)
-    df['pnl'] = df['pnl'].apply(style_pnl)
+            return "<p>No positions have been resolved yet.</p>", None
+
+    next_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        next_cursor = (df['timestamp'].iloc[-1], int(df['id'].iloc[-1]))
+
+    # style the page's cells column-wise
+    side = df['side'].astype(str).str.upper()
+    df['side'] = '<span class="text-' + side.str.lower() + '">' + side + '</span>'
+    pnl = pd.to_numeric(df['pnl'], errors='coerce').fillna(0.0)
+    pnl_class = pnl.gt(0).map({True: 'text-buy', False: 'text-sell'})
+    # open positions (no pnl yet) and break-even trades show plain $0.00
+    df['pnl'] = ('<span class="' + pnl_class + '">' + pnl.map('${:+.2f}'.format) + '</span>').where(pnl != 0, '$0.00')
     df['price'] = df['price'].map('${:,.2f}'.format)
     df['whale_wallet'] = df['whale_wallet'].str[:10] + '...'
     # truncate question if too long, but show more than before (80 chars instead of 50)
-    df['question'] = df['question'].apply(lambda x: (x[:80] + '...') if x and len(str(x)) > 80 else (x if x else 'N/A'))
+    question = df['question'].fillna('').astype(str).replace('', 'N/A')
+    df['question'] = question.where(question.str.len() <= 80, question.str[:80] + '...')
     df['timestamp'] = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m-%d %H:%M')
 
     # reorder cols for display (question replaces market_id)
@@ -502,25 +533,25 @@ def load_positions_as_html(is_resolved=0, limit=500):
 
     df_final = df[final_cols]
 
-    return df_final.to_html(
+    html = df_final.to_html(
         classes='retro-table',
         escape=False,
         index=False,
         header=True
     )
+    return html, next_cursor
 
-@st.cache_data
-def load_top_profitable_whales():
+@st.cache_data(max_entries=TOKEN_CACHE_ENTRIES)
+def load_top_profitable_whales(resolutions_token):
     """fetches the top 5 whale wallets by total realized p&l."""
     conn = get_db_connection()
     if conn:
         try:
+            # whale_stats holds each wallet's running totals (kept current by triggers)
             query = """
-                    SELECT whale_wallet, SUM(pnl) as total_pnl
-                    FROM trades
-                    WHERE is_resolved = 1
-                    GROUP BY whale_wallet
-                    HAVING total_pnl > 0
+                    SELECT whale_wallet, resolved_pnl as total_pnl
+                    FROM whale_stats
+                    WHERE resolved_count > 0 AND resolved_pnl > 0
                     ORDER BY total_pnl DESC
                         LIMIT 5 \
                     """
@@ -532,8 +563,8 @@ def load_top_profitable_whales():
 
     return pd.DataFrame(columns=['whale_wallet', 'total_pnl'])
 
-@st.cache_data
-def load_pnl_history_for_whale(whale_wallet):
+@st.cache_data(max_entries=TOKEN_CACHE_ENTRIES)
+def load_pnl_history_for_whale(resolutions_token, whale_wallet):
     """fetches p&l history for one specific whale."""
     conn = get_db_connection()
     if conn and whale_wallet:
@@ -552,18 +583,15 @@ def load_pnl_history_for_whale(whale_wallet):
             return pd.DataFrame(columns=['timestamp', 'cumulative_pnl'])
     return pd.DataFrame(columns=['timestamp', 'cumulative_pnl'])
 
-@st.cache_data
-def load_win_loss_ratio():
+@st.cache_data(max_entries=TOKEN_CACHE_ENTRIES)
+def load_win_loss_ratio(resolutions_token):
     """calculates simulation-wide wins vs losses."""
     conn = get_db_connection()
     if conn:
         try:
             query = """
-                    SELECT
-                        SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END) as wins,
-                        SUM(CASE WHEN pnl < 0 THEN 1 ELSE 0 END) as losses
-                    FROM trades
-                    WHERE is_resolved = 1 \
+                    SELECT SUM(wins) as wins, SUM(losses) as losses
+                    FROM whale_stats \
                     """
             # using .iloc[0] because sql query always returns one row
             df = pd.read_sql_query(query, conn).iloc[0]
@@ -585,8 +613,38 @@ def get_latest_logs(num_lines=50):
     except Exception as e:
         return f"[ERROR READING LOG: {e}]"
 
+def show_positions_page(tokens, is_resolved, filters, label):
+    """
+    renders the current page of a position table with newer/older buttons.
+    each table keeps a stack of page cursors in session state, so the page
+    survives the auto-refresh; changing the filters goes back to the newest page.
+    """
+    key = f"position_cursors_{is_resolved}"
+    if st.session_state.get(f"{key}_filters") != filters:
+        st.session_state[key] = [None]
+        st.session_state[f"{key}_filters"] = filters
+    cursors = st.session_state[key]
+
+    html, next_cursor = load_positions_page(tokens['trades'], tokens['resolutions'], tokens['markets'],
+                                            is_resolved, filters, cursors[-1])
+    st.subheader(f"{label} (Page {len(cursors)})")
+    st.markdown(html, unsafe_allow_html=True)
+
+    newer_col, older_col = st.columns(2)
+    with newer_col:
+        if st.button("< NEWER", key=f"{key}_newer", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with older_col:
+        if st.button("OLDER >", key=f"{key}_older", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+
 # --- main app layout ---
 
+# one cheap change check per rerun; every cached loader below is keyed on these
+tokens = get_change_tokens()
+
 st.title(" 〽️ PolyMimic: A PolyMarket Copy-Trading Simulator")
 
 # create the main tabs for dashboard vs log
@@ -644,7 +702,7 @@ with main_tab1:
     if 'last_trade_timestamp' not in st.session_state:
         st.session_state.last_trade_timestamp = None
 
-    ticker_text, new_latest_timestamp = load_open_positions_ticker()
+    ticker_text, new_latest_timestamp = load_open_positions_ticker(tokens['trades'], tokens['resolutions'], tokens['markets'])
 
     # check if there's a new trade to show a toast for
     if new_latest_timestamp and st.session_state.last_trade_timestamp:
@@ -685,9 +743,7 @@ with main_tab1:
             except Exception as e:
                 st.error(f"An unexpected error occurred: {e}")
 
-        # clear all caches and rerun the app
-        st.cache_data.clear()
-        st.cache_resource.clear()
+        # the analyzer's commits change the tokens, so the rerun reloads just what it touched
         st.rerun()
 
     # --- graphs ---
@@ -697,7 +753,7 @@ with main_tab1:
 
     with col1:
         st.subheader("Total P&L Over Time")
-        pnl_history_df = load_pnl_history()
+        pnl_history_df = load_pnl_history(tokens['resolutions'])
 
         if pnl_history_df.empty:
             st.info("No P&L history yet. Run the daily analyzer after some trades have resolved.")
@@ -752,10 +808,11 @@ with main_tab1:
 
     with col2:
         st.subheader("P&L by Market Group")
-        group_pnl_df = load_market_group_pnl()
+        group_pnl_df = load_market_group_pnl(tokens['resolutions'], tokens['markets'])
 
         if group_pnl_df.empty:
-            st.info("No resolved trades with market groups found.")
+            st.info("No resolved trades with market groups found. Groups come from the preprocessing groups file: "
+                    "run `python market_store.py [groups.csv]` if it isn't at the default path.")
         else:
             fig_bar = px.bar(
                 group_pnl_df,
@@ -827,7 +884,7 @@ with main_tab1:
     # --- win/loss chart (smaller, in column 3) ---
     with col3:
         st.subheader("Win/Loss")
-        win_loss = load_win_loss_ratio()
+        win_loss = load_win_loss_ratio(tokens['resolutions'])
 
         if win_loss['wins'] == 0 and win_loss['losses'] == 0:
             st.info("No resolved trades.")
@@ -883,7 +940,7 @@ with main_tab1:
     # --- roi percentage chart (new row) ---
     st.markdown("---")
     st.subheader("ROI Percentage Over Time")
-    roi_df = load_roi_history()
+    roi_df = load_roi_history(tokens['trades'], tokens['resolutions'])
     
     if roi_df.empty:
         st.info("No ROI data available. Run daily analyzer after some trades have resolved.")
@@ -942,23 +999,38 @@ with main_tab1:
     st.markdown("---")
     st.header("Live Simulation Trades")
 
+    # filters go into the query, so they search all positions, not just the page on screen
+    filter_wallets, filter_groups = load_position_filter_options(tokens['trades'], tokens['markets'])
+    fcol1, fcol2, fcol3, fcol4 = st.columns([3, 1, 2, 2])
+    with fcol1:
+        whale_filter = st.selectbox("Whale", ["All"] + filter_wallets)
+    with fcol2:
+        side_filter = st.selectbox("Side", ["All", "BUY", "SELL"])
+    with fcol3:
+        group_filter = st.selectbox("Market Group", ["All"] + filter_groups)
+    with fcol4:
+        date_filter = st.date_input("Date Range", value=())
+    position_filters = {
+        'whale': None if whale_filter == "All" else whale_filter,
+        'side': None if side_filter == "All" else side_filter,
+        'market_group': None if group_filter == "All" else group_filter,
+        'start_date': date_filter[0] if len(date_filter) > 0 else None,
+        'end_date': date_filter[1] if len(date_filter) > 1 else None,
+    }
+
     tab1, tab2 = st.tabs(["LIVE OPEN POSITIONS", "RECENT CLOSED POSITIONS"])
 
     with tab1:
-        st.subheader("Last 20 Open Positions")
-        open_positions_html = load_positions_as_html(is_resolved=0, limit=20)
-        st.markdown(open_positions_html, unsafe_allow_html=True)
+        show_positions_page(tokens, 0, position_filters, "Open Positions")
 
     with tab2:
-        st.subheader("Last 20 Closed Positions")
-        closed_positions_html = load_positions_as_html(is_resolved=1, limit=20)
-        st.markdown(closed_positions_html, unsafe_allow_html=True)
+        show_positions_page(tokens, 1, position_filters, "Closed Positions")
 
 
     # --- top whales table ---
     st.markdown("---")
     st.header("America's Next Top Whales!!!")
-    whale_df = load_top_profitable_whales()
+    whale_df = load_top_profitable_whales(tokens['resolutions'])
 
     if whale_df.empty:
         st.info("No resolved trades yet to rank whale profitability.")
@@ -1001,11 +1073,11 @@ with main_tab1:
         st.info("No profitable whales to analyze yet.")
     else:
         # use the full wallet address for the selectbox value
-        full_whale_addresses = load_top_profitable_whales()['whale_wallet'].tolist()
+        full_whale_addresses = load_top_profitable_whales(tokens['resolutions'])['whale_wallet'].tolist()
 
         # but display the truncated version
         # fixed a bug here: .set_index('whale_wallet')
-        whale_display_map = {w: f"{w[:10]}... (P&L: ${pnl:.2f})" for w, pnl in load_top_profitable_whales().set_index('whale_wallet')['total_pnl'].items()}
+        whale_display_map = {w: f"{w[:10]}... (P&L: ${pnl:.2f})" for w, pnl in load_top_profitable_whales(tokens['resolutions']).set_index('whale_wallet')['total_pnl'].items()}
 
 
         selected_whale_display = st.selectbox(
@@ -1014,7 +1086,7 @@ with main_tab1:
             format_func=lambda w: whale_display_map.get(w, f"{w[:10]}...") # show truncated address
         )
 
-        whale_pnl_df = load_pnl_history_for_whale(selected_whale_display)
+        whale_pnl_df = load_pnl_history_for_whale(tokens['resolutions'], selected_whale_display)
 
         if whale_pnl_df.empty:
             st.info(f"No resolved P&L history for wallet {selected_whale_display[:10]}...")
@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+from aiohttp import web
+
+from live_trade_simulator import TOP_N_WHALES, top_whales
+
+# --- config ---
+# local stand-in for the rtds websocket and the gamma /markets endpoint, for load-testing
+# the simulator. point it here with (in .env):
+#   POLYMIMIC_WEBSOCKET_URL=ws://127.0.0.1:8765/
+#   POLYMIMIC_MARKETS_URL=http://127.0.0.1:8765/markets
+#   POLYMIMIC_POSITIONS_URL=http://127.0.0.1:8765/positions
+WHALE_REPORT_FILE = Path("~/IdeaProjects/PolyCopy/modules/scalar_analysis/whale_report.csv").expanduser()
+DEFAULT_PORT = 8765
+STATS_INTERVAL = 5  # seconds between throughput prints
+
+OUTCOMES = ["Yes", "No"]
+MAX_POSITIONS_PER_WHALE = 3  # markets each whale "holds" in the /positions stub
+
+
+def random_address(length=40):
+    return "0x" + "".join(random.choice("0123456789abcdef") for _ in range(length))
+
+
+def load_whale_addresses(path, count):
+    """
+    uses the real watchlist if it exists, otherwise makes up whale addresses.
+    from a report, only the wallets the simulator actually watches (its top n
+    by total_pnl) count as whales, so --whale-ratio means what it says.
+    """
+    if path and os.path.exists(path):
+        addresses = sorted(top_whales(pd.read_csv(path).dropna(subset=['user'])))
+        if addresses:
+            print(f"using the top {len(addresses)} whale addresses from '{path}'.")
+            return addresses
+    print(f"no whale report found, generating {count} random whale addresses.")
+    return [random_address() for _ in range(count)]
+
+
+class FeedGenerator:
+    """builds synthetic activity/orders_matched frames."""
+
+    def __init__(self, whales, num_markets, whale_ratio, makers_per_trade):
+        self.whales = whales
+        self.whale_set = set(whales)
+        self.markets = [random_address(64) for _ in range(num_markets)]
+        self.whale_ratio = whale_ratio
+        self.makers_per_trade = makers_per_trade
+        # non-whale traders come from a fixed crowd so addresses repeat like in a real feed
+        self.crowd = [random_address() for _ in range(max(1000, len(whales) * 10))]
+
+    def _wallet(self, is_whale):
+        return random.choice(self.whales) if is_whale else random.choice(self.crowd)
+
+    def frame(self):
+        is_whale_trade = random.random() < self.whale_ratio
+        # a whale shows up as the taker or as one of the makers
+        whale_is_taker = is_whale_trade and random.random() < 0.5
+        maker_orders = [
+            {
+                "maker_address": self._wallet(False),
+                "matched_amount": f"{random.uniform(1, 500):.2f}",
+                "price": f"{random.uniform(0.01, 0.99):.2f}",
+            }
+            for _ in range(self.makers_per_trade)
+        ]
+        if is_whale_trade and not whale_is_taker:
+            maker_orders[random.randrange(len(maker_orders))]["maker_address"] = self._wallet(True)
+
+        now = time.time()
+        payload = {
+            "proxyWallet": self._wallet(whale_is_taker),
+            "conditionId": random.choice(self.markets),
+            "transactionHash": random_address(64),
+            "price": f"{random.uniform(0.01, 0.99):.2f}",
+            "size": f"{random.uniform(1, 1000):.2f}",
+            "side": random.choice(["BUY", "SELL"]),
+            "outcome": random.choice(OUTCOMES),
+            "timestamp": int(now),
+            "maker_orders": maker_orders,
+        }
+        return json.dumps({
+            "topic": "activity",
+            "type": "orders_matched",
+            "timestamp": int(now * 1000),
+            "payload": payload,
+        })
+
+
+class FakeFeedServer:
+    """serves the websocket feed and a /markets stub from one aiohttp app."""
+
+    def __init__(self, generator, rate, burst_size, closed_ratio, api_latency_ms):
+        self.generator = generator
+        self.rate = rate
+        self.burst_size = max(1, burst_size)
+        self.api_latency = api_latency_ms / 1000.0
+        # decide up front which markets are closed so answers are stable across calls
+        self.closed_markets = {m for m in generator.markets if random.random() < closed_ratio}
+        self.frames_sent = 0
+        self.market_requests = 0
+        self.position_requests = 0
+
+    async def handle_ws(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        # same protocol as on_open: wait for the subscribe message first
+        msg = await ws.receive()
+        try:
+            subscription = json.loads(msg.data)
+        except (TypeError, ValueError):
+            await ws.close()
+            return ws
+        if subscription.get("action") != "subscribe":
+            await ws.close()
+            return ws
+        print(f"client subscribed: {[s.get('topic') for s in subscription.get('subscriptions', [])]}")
+
+        # frames go out in bursts of burst_size, spaced so the average rate holds
+        interval = self.burst_size / self.rate
+        next_burst = time.monotonic()
+        try:
+            while not ws.closed:
+                for _ in range(self.burst_size):
+                    await ws.send_str(self.generator.frame())
+                    self.frames_sent += 1
+                next_burst += interval
+                delay = next_burst - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    # running behind; yield so the client's reads aren't starved
+                    await asyncio.sleep(0)
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        print("client disconnected.")
+        return ws
+
+    async def handle_markets(self, request):
+        """stub of gamma /markets?condition_ids=a,b,c"""
+        self.market_requests += 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+        ids = [i for i in request.query.get('condition_ids', '').split(',') if i]
+        known = set(self.generator.markets)
+        markets = []
+        for condition_id in ids:
+            if condition_id not in known:
+                continue
+            closed = condition_id in self.closed_markets
+            markets.append({
+                "conditionId": condition_id,
+                "question": f"Synthetic market {condition_id[:10]}?",
+                "closed": closed,
+                "endDate": "2030-01-01T00:00:00Z",
+                "umaResolutionStatus": "resolved" if closed else None,
+                "outcomes": json.dumps(OUTCOMES),
+                "outcomePrices": json.dumps(["1", "0"] if closed else ["0.5", "0.5"]),
+            })
+        return web.json_response(markets)
+
+    async def handle_positions(self, request):
+        """stub of data-api /positions?user=..., for the simulator's cache warm-up"""
+        self.position_requests += 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+        user = request.query.get('user', '').lower()
+        if user not in self.generator.whale_set:
+            return web.json_response([])
+        # seeded by the wallet, so a whale holds the same markets on every call
+        held = random.Random(user).sample(self.generator.markets, min(MAX_POSITIONS_PER_WHALE, len(self.generator.markets)))
+        return web.json_response([
+            {"proxyWallet": user, "conditionId": condition_id, "outcome": OUTCOMES[0], "size": 100}
+            for condition_id in held
+        ])
+
+    async def report_stats(self, app):
+        last_frames = 0
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            sent = self.frames_sent - last_frames
+            last_frames = self.frames_sent
+            print(f"sent {sent / STATS_INTERVAL:,.0f} frames/sec ({self.frames_sent} total) | "
+                  f"/markets requests: {self.market_requests} | /positions requests: {self.position_requests}")
+
+    async def start_background(self, app):
+        app['stats_task'] = asyncio.ensure_future(self.report_stats(app))
+
+    async def stop_background(self, app):
+        app['stats_task'].cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="local stand-in for the polymarket activity websocket and gamma /markets.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--rate", type=float, default=1000, help="average frames per second")
+    parser.add_argument("--whale-ratio", type=float, default=0.01, help="fraction of trades involving a whale")
+    parser.add_argument("--markets", type=int, default=500, help="number of distinct markets")
+    parser.add_argument("--burst-size", type=int, default=1, help="frames sent back-to-back per burst (1 = smooth)")
+    parser.add_argument("--makers", type=int, default=2, help="maker orders per trade")
+    parser.add_argument("--closed-ratio", type=float, default=0.05, help="fraction of markets reported as closed")
+    parser.add_argument("--api-latency-ms", type=float, default=50, help="artificial /markets response delay")
+    parser.add_argument("--whales", type=Path, default=WHALE_REPORT_FILE, help="whale_report.csv to draw whale addresses from")
+    parser.add_argument("--num-whales", type=int, default=TOP_N_WHALES, help="whales to generate if no report is found")
+    parser.add_argument("--write-whales", type=Path, help="save the whale addresses used as a whale_report.csv for the simulator")
+    parser.add_argument("--seed", type=int, help="random seed for a repeatable feed")
+    args = parser.parse_args()
+
+    if args.rate <= 0:
+        print("error: --rate must be positive.")
+        sys.exit(1)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    whales = load_whale_addresses(args.whales, args.num_whales)
+    if args.write_whales:
+        pd.DataFrame({'user': whales, 'total_pnl': 1.0}).to_csv(args.write_whales, index=False)
+        print(f"wrote {len(whales)} whales to '{args.write_whales}'.")
+
+    generator = FeedGenerator(whales, args.markets, args.whale_ratio, max(1, args.makers))
+    server = FakeFeedServer(generator, args.rate, args.burst_size, args.closed_ratio, args.api_latency_ms)
+
+    app = web.Application()
+    app.router.add_get('/', server.handle_ws)
+    app.router.add_get('/markets', server.handle_markets)
+    app.router.add_get('/positions', server.handle_positions)
+    app.on_startup.append(server.start_background)
+    app.on_cleanup.append(server.stop_background)
+
+    print(f"fake feed on ws://127.0.0.1:{args.port}/, gamma stub on http://127.0.0.1:{args.port}/markets "
+          f"and positions stub on http://127.0.0.1:{args.port}/positions")
+    print(f"rate={args.rate:g}/s whale_ratio={args.whale_ratio:g} markets={args.markets} burst_size={args.burst_size}")
+    web.run_app(app, host='127.0.0.1', port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import gzip
+import json
+import logging
+import queue
+import time
+from threading import Thread, Lock
+
+# --- config ---
+RECORD_CHUNK_FRAMES = 5000  # frames per compressed chunk
+RECORD_CHUNK_SECONDS = 10  # max seconds a frame waits in memory before its chunk is written
+
+
+class FeedRecorder:
+    """
+    appends every raw websocket frame, with its receive timestamp, to a
+    compressed, chunked feed log.
+
+    the log is a sequence of independent gzip members appended to one file.
+    each member holds one chunk of json lines: [receive_ts, frame]. python's
+    gzip module reads a multi-member file as one stream, and a crash can
+    only lose the chunk that was still in memory.
+    """
+
+    def __init__(self, path, chunk_frames=RECORD_CHUNK_FRAMES, chunk_seconds=RECORD_CHUNK_SECONDS):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.chunk_seconds = chunk_seconds
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = Lock()
+        self.frames_recorded = 0
+        self.chunks_written = 0
+
+    def start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._thread = Thread(target=self._run, name="feed-recorder", daemon=True)
+        self._thread.start()
+        logging.info(f"recording raw feed to '{self.path}'.")
+
+    def record(self, message, received_at=None):
+        """called from the receive path. only enqueues; compression happens on the recorder thread."""
+        if received_at is None:
+            received_at = time.time()
+        self._queue.put((received_at, message))
+
+    def _run(self):
+        chunk = []
+        deadline = None
+        while True:
+            timeout = None if not chunk else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()  # chunk timed out
+
+            if item is None:  # shutdown sentinel
+                break
+            if item:
+                if not chunk:
+                    deadline = time.monotonic() + self.chunk_seconds
+                received_at, message = item
+                if isinstance(message, bytes):
+                    message = message.decode('utf-8', errors='replace')
+                chunk.append(json.dumps([received_at, message]))
+
+            if chunk and (len(chunk) >= self.chunk_frames or time.monotonic() >= deadline):
+                self._write_chunk(chunk)
+                chunk = []
+
+        self._write_chunk(chunk)
+
+    def _write_chunk(self, lines):
+        if not lines:
+            return
+        data = gzip.compress(("\n".join(lines) + "\n").encode('utf-8'))
+        try:
+            with open(self.path, 'ab') as f:
+                f.write(data)
+        except OSError as e:
+            logging.error(f"error writing feed chunk to '{self.path}': {e}")
+            return
+        with self._lock:
+            self.frames_recorded += len(lines)
+            self.chunks_written += 1
+
+    def stop(self, timeout=10):
+        """writes whatever is buffered and stops the recorder thread."""
+        if self._thread is None:
+            return True
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        return not self._thread.is_alive()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self._queue.qsize(),
+                'frames_recorded': self.frames_recorded,
+                'chunks_written': self.chunks_written
+            }
+
+
+def read_feed_log(path):
+    """
+    yields (receive_ts, frame) from a feed log written by FeedRecorder.
+    a truncated final chunk (e.g. after a crash) ends the replay quietly.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    received_at, message = json.loads(line)
+                except (ValueError, TypeError):
+                    continue
+                yield received_at, message
+        except (EOFError, gzip.BadGzipFile) as e:
+            logging.warning(f"feed log '{path}' ends with a truncated chunk: {e}")
@@ -0,0 +1,104 @@
+import multiprocessing as mp
+import struct
+from multiprocessing.sharedctypes import RawArray
+
+# --- config ---
+RING_SLOTS = 2048  # frames a ring can hold before the receiver has to drop or wait
+RING_SLOT_SIZE = 4096  # bytes per slot, header included; bigger frames go through the overflow queue
+
+SLOT_HEADER = struct.Struct("<dI")  # receive time (epoch seconds), payload length
+STOP_MARKER = 0xFFFFFFFF  # length value that tells the consumer to exit
+OVERFLOW_MARKER = 0xFFFFFFFE  # length value meaning "this frame is on the overflow queue"
+
+
+class FrameRing:
+    """
+    single-producer / single-consumer ring of raw frames in shared memory,
+    used to hand frames from the receiver process to one parse process.
+
+    the ring is a fixed array of slots. two semaphores count free and filled
+    slots, so each side keeps its own position locally and never touches the
+    other's; the semaphore calls are also what makes the slot bytes visible
+    across processes. a frame larger than a slot is sent through a regular
+    multiprocessing queue, with a marker slot keeping it in order.
+
+    create it in the parent before starting the consumer process, then pass
+    it to the process as an argument.
+    """
+
+    def __init__(self, slots=RING_SLOTS, slot_size=RING_SLOT_SIZE):
+        self.slots = slots
+        self.slot_size = slot_size
+        self._buffer = RawArray('B', slots * slot_size)
+        self._free = mp.Semaphore(slots)
+        self._filled = mp.Semaphore(0)
+        self._overflow = mp.Queue()
+        # don't hold up the receiver's exit for oversized frames nobody will read
+        self._overflow.cancel_join_thread()
+        self._view = None
+        self._position = 0  # next slot to write (producer) or read (consumer)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_view'] = None
+        state['_position'] = 0
+        return state
+
+    def _slot(self):
+        if self._view is None:
+            self._view = memoryview(self._buffer).cast('B')
+        start = (self._position % self.slots) * self.slot_size
+        self._position += 1
+        return start
+
+    def push(self, data, received_at, timeout=None):
+        """
+        copies one frame into the next free slot. returns false if the ring
+        stayed full (non-blocking when timeout is none).
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if timeout is None:
+            acquired = self._free.acquire(block=False)
+        else:
+            acquired = self._free.acquire(timeout=timeout)
+        if not acquired:
+            return False
+
+        start = self._slot()
+        if len(data) > self.slot_size - SLOT_HEADER.size:
+            self._overflow.put(data)
+            SLOT_HEADER.pack_into(self._view, start, received_at, OVERFLOW_MARKER)
+        else:
+            SLOT_HEADER.pack_into(self._view, start, received_at, len(data))
+            body = start + SLOT_HEADER.size
+            self._view[body:body + len(data)] = data
+        self._filled.release()
+        return True
+
+    def close(self, timeout=None):
+        """
+        tells the consumer to exit once it has read every frame before this.
+        returns false if no slot freed up within timeout (consumer stuck or gone).
+        """
+        if not self._free.acquire(timeout=timeout):
+            return False
+        start = self._slot()
+        SLOT_HEADER.pack_into(self._view, start, 0.0, STOP_MARKER)
+        self._filled.release()
+        return True
+
+    def get(self):
+        """blocks for the next frame. returns (received_at, bytes), or none after close()."""
+        self._filled.acquire()
+        start = self._slot()
+        received_at, length = SLOT_HEADER.unpack_from(self._view, start)
+        if length == STOP_MARKER:
+            data = None
+        elif length == OVERFLOW_MARKER:
+            data = self._overflow.get()
+        else:
+            body = start + SLOT_HEADER.size
+            data = bytes(self._view[body:body + length])
+        self._free.release()
+        return None if data is None else (received_at, data)
@@ -1,8 +1,12 @@
 import sqlite3
 import random
+import numpy as np
 import os
 from datetime import datetime, timedelta
 from pathlib import Path
+from market_store import upsert_markets
+from migrations import migrate
+from pnl import is_buy, trade_pnl
 
 # --- config ---
 DATABASE_FILE = Path("~/IdeaProjects/PolyCopy/db/simulation.db").expanduser()
@@ -52,29 +56,6 @@ def generate_fake_market_id():
     """generates a fake market id (condition id format)."""
     return "0x" + "".join([random.choice("0123456789abcdef") for _ in range(64)])
 
-def calculate_pnl_for_trade(entry_price, side, outcome, settlement_price):
-    """
-    calculates pnl for a trade.
-    for buy: pnl = (settlement_price - entry_price) * shares
-    for sell: pnl = (entry_price - settlement_price) * shares
-    """
-    bet_amount = SIMULATED_BET_AMOUNT
-    
-    if side.upper() == "BUY":
-        if entry_price == 0:
-            return 0
-        shares = bet_amount / entry_price
-        value_at_settlement = shares * settlement_price
-        pnl = value_at_settlement - bet_amount
-    else:  # SELL
-        if (1 - entry_price) == 0:
-            return 0
-        shares = bet_amount / (1 - entry_price)
-        payout_at_settlement = shares * (1 - settlement_price)
-        pnl = payout_at_settlement - bet_amount
-    
-    return round(pnl, 2)
-
 def generate_fake_trade(days_ago: int):
     """generates a single fake trade with realistic data.
     
@@ -107,9 +88,6 @@ def generate_fake_trade(days_ago: int):
     else:  # NO
         settlement_price = 0.0 if is_winner else 1.0
     
-    # calculate pnl
-    pnl = calculate_pnl_for_trade(entry_price, side, outcome, settlement_price)
-    
     # generate timestamp specifically 1 or 2 days ago at a random time within that day
     days_ago = 1 if days_ago <= 1 else 2
     base_dt = datetime.now() - timedelta(days=days_ago)
@@ -127,7 +105,7 @@ def generate_fake_trade(days_ago: int):
         'price': entry_price,
         'simulated_bet': SIMULATED_BET_AMOUNT,
         'is_resolved': 1,
-        'pnl': pnl,
+        'settlement_price': settlement_price,
         'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S')
     }
 
@@ -141,34 +119,21 @@ def main():
         conn = sqlite3.connect(DATABASE_FILE)
         cursor = conn.cursor()
         
-        # ensure table exists
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS trades (
-                                                             id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                                                             whale_wallet TEXT NOT NULL,
-                                                             market_id TEXT NOT NULL,
-                                                             question TEXT,
-                                                             outcome TEXT NOT NULL,
-                                                             side TEXT NOT NULL,
-                                                             price REAL NOT NULL,
-                                                             simulated_bet REAL NOT NULL,
-                                                             is_resolved INTEGER DEFAULT 0,
-                                                             pnl REAL DEFAULT 0
-                       )
-                       ''')
+        # bring the schema up to date (creates the tables on a new database)
+        migrate(conn)
         
         # generate and insert fake trades
-        trades = []
-        total_pnl = 0
-        
-        for i in range(NUM_TRADES):
-            # first half 1 day ago, second half 2 days ago
-            target_days_ago = 1 if i < (NUM_TRADES // 2) else 2
-            trade = generate_fake_trade(target_days_ago)
-            trades.append(trade)
-            total_pnl += trade['pnl']
-            
+        # first half 1 day ago, second half 2 days ago
+        trades = [generate_fake_trade(1 if i < (NUM_TRADES // 2) else 2) for i in range(NUM_TRADES)]
+
+        # settle them all at once with the analyzer's p&l kernel
+        pnls = np.round(trade_pnl(is_buy([t['side'] for t in trades]), [t['price'] for t in trades],
+                                  [t['simulated_bet'] for t in trades], [t['settlement_price'] for t in trades]), 2)
+        for trade, pnl in zip(trades, pnls):
+            trade['pnl'] = float(pnl)
+        total_pnl = sum(t['pnl'] for t in trades)
+
+        for trade in trades:
             cursor.execute('''
                            INSERT INTO trades (whale_wallet, market_id, question, outcome, side, price, simulated_bet, is_resolved, pnl, timestamp)
                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -184,6 +149,8 @@ def main():
                 trade['pnl'],
                 trade['timestamp']
             ))
+            # the dashboard reads questions from the markets table
+            upsert_markets(conn, [{'conditionId': trade['market_id'], 'question': trade['question'], 'closed': True}])
         
         conn.commit()
         
@@ -0,0 +1,117 @@
+from threading import Lock
+
+# --- config ---
+SUB_BUCKET_BITS = 6  # 64 sub-buckets per power of two -> ~1.5% worst-case relative error
+
+# pipeline stages tracked by the simulator, in pipeline order
+STAGES = (
+    'feed_delay',  # exchange timestamp -> frame received
+    'prefilter',  # frame received -> prefilter done
+    'queue_wait',  # prefilter done -> picked up by a worker
+    'metadata',  # market metadata lookup
+    'db_commit',  # trade queued for the writer -> committed
+    'detect_to_commit',  # frame received -> committed
+    'copy_latency',  # exchange timestamp -> committed (how stale the simulated copy is)
+    'gamma_api',  # one gamma /markets request
+)
+
+
+class LatencyHistogram:
+    """
+    hdr-style log-linear histogram of latencies in microseconds.
+    values below 2^SUB_BUCKET_BITS get exact buckets; above that each power
+    of two is split into 2^(SUB_BUCKET_BITS-1) linear sub-buckets, so memory
+    stays tiny and percentiles keep a bounded relative error at any scale.
+    """
+
+    def __init__(self):
+        self._sub_buckets = 1 << SUB_BUCKET_BITS
+        self._half = self._sub_buckets // 2
+        self._counts = {}
+        self._lock = Lock()
+        self.count = 0
+        self.max_us = 0
+
+    def _index(self, value):
+        if value < self._sub_buckets:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return shift * self._half + (value >> shift)
+
+    def _value_at(self, index):
+        """representative (midpoint) value of a bucket, in microseconds."""
+        if index < self._sub_buckets:
+            return index
+        shift = index // self._half - 1
+        low = (index - shift * self._half) << shift
+        return low + ((1 << shift) - 1) / 2
+
+    def record(self, seconds):
+        if seconds is None:
+            return
+        value = max(0, int(seconds * 1e6))
+        index = self._index(value)
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            self.count += 1
+            if value > self.max_us:
+                self.max_us = value
+
+    def percentile(self, pct):
+        """returns the pct-th percentile in microseconds (0 if empty)."""
+        with self._lock:
+            if not self.count:
+                return 0
+            target = max(1, int(round(self.count * pct / 100.0)))
+            seen = 0
+            for index in sorted(self._counts):
+                seen += self._counts[index]
+                if seen >= target:
+                    return min(self._value_at(index), self.max_us)
+        return self.max_us
+
+    def reset(self):
+        with self._lock:
+            self._counts = {}
+            self.count = 0
+            self.max_us = 0
+
+    def summary(self):
+        """returns {'count', 'p50_ms', 'p99_ms', 'max_ms'}."""
+        return {
+            'count': self.count,
+            'p50_ms': self.percentile(50) / 1000.0,
+            'p99_ms': self.percentile(99) / 1000.0,
+            'max_ms': self.max_us / 1000.0,
+        }
+
+
+class LatencyTracker:
+    """
+    one rolling histogram per pipeline stage. report_and_reset() returns the
+    summaries for the window since the last report and starts a new window.
+    """
+
+    def __init__(self, stages=STAGES):
+        self.histograms = {stage: LatencyHistogram() for stage in stages}
+
+    def record(self, stage, seconds):
+        self.histograms[stage].record(seconds)
+
+    def summaries(self):
+        return {stage: hist.summary() for stage, hist in self.histograms.items()}
+
+    def report_and_reset(self):
+        summaries = self.summaries()
+        for hist in self.histograms.values():
+            hist.reset()
+        return summaries
+
+
+def format_summaries(summaries):
+    """one log-friendly line per stage that saw any samples."""
+    lines = []
+    for stage, s in summaries.items():
+        if s['count']:
+            lines.append(f"{stage:<17} n={s['count']:<7} p50={s['p50_ms']:9.2f}ms  p99={s['p99_ms']:9.2f}ms  max={s['max_ms']:9.2f}ms")
+    return lines
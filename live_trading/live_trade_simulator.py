@@ -1,5 +1,6 @@
 import websocket
 import json
+import re
 import sqlite3
 import pandas as pd
 import os
@@ -7,13 +8,38 @@ import sys
 import time
 import logging
 import requests
-from datetime import datetime, timedelta
-from threading import Thread
+import queue
+import signal
+import asyncio
+import atexit
+import itertools
+import concurrent.futures
+import multiprocessing as mp
+from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from threading import Thread, Lock
 from dotenv import load_dotenv
 from pathlib import Path
+from compact_schema import COMPACT_INSERT_SQL, intern_trade_keys, is_compact, register_functions
+from feed_log import FeedRecorder
+from frame_ring import FrameRing
+from market_store import load_markets, market_row, UPSERT_SQL as MARKET_UPSERT_SQL
+from latency import LatencyTracker, format_summaries
+from metrics import Counters, start_metrics_server
+from migrations import migrate
+
+try:
+    import aiohttp  # only needed for ASYNC_MODE
+except ImportError:
+    aiohttp = None
 
 # --- config ---
 DEBUG_MODE = False
+RECORD_FEED = False  # append every raw frame to a compressed feed log in FEED_LOG_DIR (see replay_feed.py)
+ASYNC_MODE = False  # run the asyncio pipeline (aiohttp websocket + pooled async metadata lookups)
+MULTIPROCESS_MODE = False  # parse frames in NUM_PARSE_PROCESSES processes for feed bursts one core can't keep up with (not with ASYNC_MODE)
 HEARTBEAT_INTERVAL = 60 # print a "." every 60 seconds to show it's alive
 
 load_dotenv()
@@ -22,6 +48,8 @@ load_dotenv()
 WHALE_REPORT_FILE = Path("~/IdeaProjects/PolyCopy/modules/scalar_analysis/whale_report.csv").expanduser()
 DATABASE_FILE = Path("~/IdeaProjects/PolyCopy/db/simulation.db").expanduser()
 SIMULATOR_LOG_FILE = Path("~/IdeaProjects/PolyCopy/logs/simulator.log").expanduser()
+FEED_LOG_DIR = Path("~/IdeaProjects/PolyCopy/logs/feed").expanduser()
+FRAME_LOG_FILE = Path("~/IdeaProjects/PolyCopy/logs/frames.log").expanduser()  # sampled raw frames (DEBUG_MODE)
 
 # --- AUTH KEYS ---
 API_KEY = os.getenv("POLYMARKET_API_KEY")
@@ -29,39 +57,566 @@ API_SECRET = os.getenv("POLYMARKET_SECRET_KEY")
 API_PASSPHRASE = os.getenv("POLYMARKET_PASSPHRASE")
 
 # --- SIMULATION ---
-WEBSOCKET_URL = "wss://ws-live-data.polymarket.com"
-MARKETS_URL = "https://gamma-api.polymarket.com/markets"
+# both can be pointed at fake_feed_server.py from .env for local load tests
+WEBSOCKET_URL = os.getenv("POLYMIMIC_WEBSOCKET_URL", "wss://ws-live-data.polymarket.com")
+MARKETS_URL = os.getenv("POLYMIMIC_MARKETS_URL", "https://gamma-api.polymarket.com/markets")
+POSITIONS_API_URL = os.getenv("POLYMIMIC_POSITIONS_URL", "https://data-api.polymarket.com/positions")
 TOP_N_WHALES = 400
 SIMULATED_BET_AMOUNT = 1.0  # $1 per trade
+WHALE_RELOAD_INTERVAL = 30  # seconds between checks of whale_report.csv for changes (0 disables hot reload)
+
+# --- MARKET METADATA CACHE ---
+MARKET_CACHE_TTL = 300  # seconds a fetched market stays fresh (closed status can change)
+MARKET_CACHE_NEGATIVE_TTL = 30  # seconds to remember markets the api doesn't know about
+MARKET_CACHE_MAX_SIZE = 20000  # least recently used markets are evicted past this
+
+# --- STARTUP WARM-UP ---
+# before subscribing, bulk-fetch metadata for markets we're likely to see first
+WARMUP_WHALE_POSITIONS = True  # also warm the markets the watchlist currently holds positions in
+WARMUP_POSITIONS_LIMIT = 100  # positions to look at per whale
+WARMUP_MAX_WORKERS = 10  # concurrent positions requests
+METADATA_BATCH_SIZE = 50  # condition_ids per /markets request (same as daily_analyzer)
+
+# --- TRADE DE-DUPLICATION ---
+# reconnects and overlapping maker/taker legs can deliver the same fill twice.
+# fills are keyed on (transactionHash, whale wallet) and remembered for a window,
+# so a repeat is dropped before any metadata lookup or db write.
+DEDUP_WINDOW = 3600  # seconds a seen fill is remembered
+DEDUP_MAX_SIZE = 200000  # oldest keys are dropped past this
+
+# --- INGEST QUEUE ---
+# frames that pass the prefilter are handed from the websocket thread to a pool
+# of worker threads, so slow api calls / db writes never block receiving.
+INGEST_QUEUE_SIZE = 10000
+NUM_WORKERS = 4
+QUEUE_FULL_POLICY = "drop_oldest"  # "drop_oldest", "drop_newest", or "block"
+QUEUE_BLOCK_TIMEOUT = 1.0  # with "block", seconds to wait for room before dropping
+SHUTDOWN_DRAIN_TIMEOUT = 30  # seconds to let workers finish queued frames on exit
+WEBSOCKET_STOP_TIMEOUT = 5  # seconds to wait for the websocket thread to finish its last frame on exit
+
+# --- METRICS ENDPOINT ---
+METRICS_ENABLED = True  # serve prometheus text metrics on http://METRICS_HOST:METRICS_PORT/metrics
+METRICS_HOST = "127.0.0.1"  # localhost only
+METRICS_PORT = 9108
+
+# --- ASYNC MODE ---
+ASYNC_HTTP_POOL_SIZE = 50  # max concurrent connections to the gamma api
+ASYNC_HTTP_TIMEOUT = 5  # seconds per metadata request
+ASYNC_MAX_PENDING = INGEST_QUEUE_SIZE  # frames being processed at once before new ones are dropped
+
+# --- MULTIPROCESS MODE ---
+# the websocket thread only copies raw frames into one shared-memory ring per parse
+# process. the parse processes prefilter and json-decode them and pass whale hits
+# to a single detection process, which owns the market cache, de-duplication and
+# the db writer. when every ring is full, QUEUE_FULL_POLICY "block" waits up to
+# QUEUE_BLOCK_TIMEOUT for room; the other policies drop the new frame.
+NUM_PARSE_PROCESSES = 4
+FRAME_RING_SLOTS = 2048  # frames per ring
+FRAME_RING_SLOT_SIZE = 4096  # bytes per slot; larger frames take a slower overflow queue
+STATS_PUBLISH_INTERVAL = 5  # seconds between the detection process's stats snapshots for the metrics endpoint
+
+# --- DB WRITER ---
+# detected trades are written by one writer thread in group commits:
+# a batch is committed every DB_BATCH_SIZE rows or DB_FLUSH_INTERVAL_MS, whichever comes first.
+DB_BATCH_SIZE = 50
+DB_FLUSH_INTERVAL_MS = 200
+DB_SYNCHRONOUS = "NORMAL"  # safe with wal: only the last commits can be lost on power failure
+DB_BUSY_TIMEOUT = 30  # seconds a write waits on another connection's lock (the analyzer's settle can take a while)
+DB_WRITE_RETRIES = 3  # attempts after a locked/busy error before a batch is dropped
+DB_RETRY_BASE_DELAY = 0.5  # seconds before the first retry, doubling each time
+
+# --- LOGGING ---
+FRAME_LOG_SAMPLE_EVERY = 100  # with DEBUG_MODE, write 1 in every n raw frames to FRAME_LOG_FILE (1 = all)
+
+# --- PREFILTER ---
+# every wallet we watch is a 0x-prefixed 40-hex-char address, and in a json frame
+# it is always a quoted string, so one precompiled pattern pulls every candidate
+# address out of a raw frame in a single c-level scan. the closing quote keeps it
+# from matching the front of longer hex strings (tx hashes, condition ids).
+ADDRESS_PATTERN = re.compile(r'"(0x[0-9a-fA-F]{40})"')
 
 # --- global state ---
 db_conn = None
-whale_wallets = set()
+db_read_lock = Lock()  # db_conn is read by the worker threads' market lookups
+whale_wallets = frozenset()
 api_session = requests.Session()
 
+
+class MarketInfoCache:
+    """
+    in-process ttl + lru cache of market metadata keyed by conditionId.
+    unknown markets are remembered in a separate short-lived negative cache
+    so we don't keep asking the api about them.
+    """
+
+    def __init__(self, ttl, negative_ttl, max_size):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # market_id -> (expires_at, market_info)
+        self._negative = OrderedDict()  # market_id -> expires_at
+        self._lock = Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, market_id):
+        """
+        returns (found, market_info). found is true for both positive and
+        negative hits; market_info is none for a negative hit.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(market_id)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(market_id)
+                    self.hits += 1
+                    return True, entry[1]
+                del self._entries[market_id]
+
+            expires_at = self._negative.get(market_id)
+            if expires_at is not None:
+                if expires_at > now:
+                    self.negative_hits += 1
+                    return True, None
+                del self._negative[market_id]
+
+            self.misses += 1
+            return False, None
+
+    def put(self, market_id, market_info):
+        """stores a fetched market, or a negative entry if market_info is none."""
+        now = time.monotonic()
+        with self._lock:
+            if market_info is None:
+                self._negative[market_id] = now + self.negative_ttl
+                self._negative.move_to_end(market_id)
+                self._evict(self._negative)
+            else:
+                self._negative.pop(market_id, None)
+                self._entries[market_id] = (now + self.ttl, market_info)
+                self._entries.move_to_end(market_id)
+                self._evict(self._entries)
+
+    def _evict(self, entries):
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """returns a snapshot of the cache counters."""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'negative_size': len(self._negative),
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits + self.negative_hits) / lookups if lookups else 0.0
+            }
+
+
+market_cache = MarketInfoCache(MARKET_CACHE_TTL, MARKET_CACHE_NEGATIVE_TTL, MARKET_CACHE_MAX_SIZE)
+
+
+class TradeDeduplicator:
+    """
+    time-windowed lru set of fill keys. keys are kept in insertion order, and
+    since every key lives for the same window the oldest one always expires
+    first, so expiry and the size bound are both o(1) pops from the front.
+    """
+
+    def __init__(self, window, max_size):
+        self.window = window
+        self.max_size = max_size
+        self._seen = OrderedDict()  # key -> expires_at
+        self._lock = Lock()
+        self.duplicates = 0
+
+    def _expire(self, now):
+        while self._seen:
+            key, expires_at = next(iter(self._seen.items()))
+            if expires_at > now:
+                break
+            del self._seen[key]
+        while len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+
+    def add_if_new(self, key):
+        """records key and returns true, or returns false if it was seen within the window."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if key in self._seen:
+                self.duplicates += 1
+                return False
+            self._seen[key] = now + self.window
+            self._expire(now)
+            return True
+
+    def load(self, keys):
+        """seeds the set with keys already in the database (oldest first)."""
+        expires_at = time.monotonic() + self.window
+        with self._lock:
+            for key in keys:
+                self._seen[key] = expires_at
+                self._seen.move_to_end(key)
+            self._expire(time.monotonic())
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._seen), 'duplicates': self.duplicates}
+
+
+trade_dedup = TradeDeduplicator(DEDUP_WINDOW, DEDUP_MAX_SIZE)
+
+
+class IngestQueue:
+    """
+    bounded queue between the websocket receive callback and the worker pool.
+    when full, the configured policy decides whether the oldest frame, the new
+    frame, or the receiver (for a bounded time) gives way.
+    """
+
+    def __init__(self, max_size, policy, block_timeout):
+        if policy not in ("drop_oldest", "drop_newest", "block"):
+            raise ValueError(f"unknown queue policy: {policy}")
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = Lock()
+        self._workers = []
+        self.enqueued = 0
+        self.dropped = 0
+        self.processed = 0
+        self.max_depth = 0
+
+    def put(self, item):
+        """called from the receive thread. never blocks longer than block_timeout."""
+        try:
+            if self.policy == "block":
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            if self.policy != "drop_oldest":
+                self._count_drop()
+                return False
+            # make room by discarding the oldest queued frame
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+                self._count_drop()
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self._count_drop()
+                return False
+
+        depth = self._queue.qsize()
+        with self._lock:
+            self.enqueued += 1
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return True
+
+    def _count_drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def start_workers(self, num_workers, handler):
+        """starts the worker threads, each calling handler(item) per queued frame."""
+        for i in range(num_workers):
+            worker = Thread(target=self._worker_loop, args=(handler,), name=f"ingest-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _worker_loop(self, handler):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:  # shutdown sentinel
+                    return
+                handler(item)
+            except Exception as e:
+                logging.error(f"error in ingest worker: {e}")
+            finally:
+                self._queue.task_done()
+                if item is not None:
+                    with self._lock:
+                        self.processed += 1
+
+    def drain_and_stop(self, timeout):
+        """
+        lets the workers finish everything already queued, then stops them.
+        the receiver must be stopped first so nothing new arrives.
+        """
+        deadline = time.monotonic() + timeout
+        for _ in self._workers:
+            # sentinels go in behind the queued frames, bypassing the drop policy
+            try:
+                self._queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for worker in self._workers:
+            worker.join(timeout=max(0.0, deadline - time.monotonic()))
+        still_running = sum(1 for w in self._workers if w.is_alive())
+        self._workers = []
+        return still_running == 0
+
+    def stats(self):
+        """returns a snapshot of the queue counters."""
+        with self._lock:
+            return {
+                'depth': self._queue.qsize(),
+                'max_depth': self.max_depth,
+                'enqueued': self.enqueued,
+                'dropped': self.dropped,
+                'processed': self.processed
+            }
+
+
+ingest_queue = IngestQueue(INGEST_QUEUE_SIZE, QUEUE_FULL_POLICY, QUEUE_BLOCK_TIMEOUT)
+
+
+class TradeWriter:
+    """
+    dedicated writer thread that owns its own sqlite connection and inserts
+    queued trade rows with executemany, committing every batch_size rows or
+    flush_interval_ms, whichever comes first. rows whose (tx_hash, whale_wallet)
+    is already stored are skipped by the unique index. market metadata fetched
+    from the api is upserted into the markets table in the same commits.
+    on a compact database (see compact_schema.py) rows go straight into trades_v2.
+    """
+
+    INSERT_SQL = '''
+                 INSERT OR IGNORE INTO trades (timestamp, whale_wallet, market_id, outcome, side, price, simulated_bet,
+                                               exchange_ts, received_ts, metadata_ms, detect_latency_ms, copy_latency_ms, tx_hash)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 '''
+
+    def __init__(self, db_file, batch_size, flush_interval_ms):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = Lock()
+        self.rows_written = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.duplicates_ignored = 0
+        self.errors = 0
+        self.retries = 0
+
+    def start(self):
+        self._thread = Thread(target=self._run, name="trade-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, row, timing=None):
+        """
+        queues one trade row (in INSERT_SQL column order) for the next group commit.
+        timing is the trade's stage timestamps, used for the commit latency histograms.
+        """
+        self._queue.put(('trade', row, timing, time.time()))
+
+    def submit_market(self, market):
+        """queues one market from the /markets api for upsert into the markets table."""
+        self._queue.put(('market', market_row(market), None, time.time()))
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_file, timeout=DB_BUSY_TIMEOUT)
+        conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+        compact = is_compact(conn)
+        if compact:
+            register_functions(conn)
+        pending = []
+        deadline = None
+        try:
+            while True:
+                timeout = None if not pending else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = ()  # flush interval expired with rows pending
+
+                if item is None:  # shutdown sentinel
+                    break
+                if item:
+                    if not pending:
+                        deadline = time.monotonic() + self.flush_interval
+                    pending.append(item)
+
+                if pending and (len(pending) >= self.batch_size or time.monotonic() >= deadline):
+                    self._flush(conn, pending, compact)
+                    pending = []
+
+            self._flush(conn, pending, compact)
+        finally:
+            conn.close()
+
+    def _flush(self, conn, items, compact=False):
+        if not items:
+            return
+        trades = [item for item in items if item[0] == 'trade']
+        rows = [row for _, row, _, _ in trades]
+        market_rows = [row for kind, row, _, _ in items if kind == 'market']
+        for attempt in range(DB_WRITE_RETRIES + 1):
+            try:
+                if market_rows:
+                    conn.executemany(MARKET_UPSERT_SQL, market_rows)
+                if compact:
+                    intern_trade_keys(conn, rows)
+                # rowcount leaves out the rows the summary triggers touch, and the ignored duplicates
+                inserted = conn.executemany(COMPACT_INSERT_SQL if compact else self.INSERT_SQL, rows).rowcount
+                conn.commit()
+                break
+            except sqlite3.Error as e:
+                conn.rollback()
+                # locked/busy outlasted the busy timeout (e.g. the analyzer settling a big batch): try again
+                if isinstance(e, sqlite3.OperationalError) and attempt < DB_WRITE_RETRIES:
+                    delay = DB_RETRY_BASE_DELAY * 2 ** attempt
+                    with self._lock:
+                        self.retries += 1
+                    logging.warning(f"database busy writing {len(rows)} trades ({e}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    continue
+                with self._lock:
+                    self.errors += 1
+                logging.error(f"error writing {len(rows)} trades and {len(market_rows)} markets to database: {e}")
+                return
+        if not rows:
+            return
+
+        with self._lock:
+            self.rows_written += inserted
+            self.duplicates_ignored += len(rows) - inserted
+            self.batches += 1
+            self.last_batch_size = len(rows)
+            self.max_batch_size = max(self.max_batch_size, len(rows))
+
+        committed_at = time.time()
+        for _, _, timing, queued_at in trades:
+            latency.record('db_commit', committed_at - queued_at)
+            if timing:
+                latency.record('detect_to_commit', committed_at - timing['received'])
+                if timing.get('exchange'):
+                    latency.record('copy_latency', committed_at - timing['exchange'])
+        logging.info("   -> committed %d simulated trade(s) to database.", len(rows))
+
+    def stop(self, timeout):
+        """flushes everything already submitted and stops the writer thread."""
+        if self._thread is None:
+            return True
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        return not self._thread.is_alive()
+
+    def stats(self):
+        """returns a snapshot of the writer counters."""
+        with self._lock:
+            return {
+                'pending': self._queue.qsize(),
+                'rows_written': self.rows_written,
+                'batches': self.batches,
+                'last_batch_size': self.last_batch_size,
+                'max_batch_size': self.max_batch_size,
+                'duplicates_ignored': self.duplicates_ignored,
+                'errors': self.errors,
+                'retries': self.retries
+            }
+
+
+trade_writer = TradeWriter(DATABASE_FILE, DB_BATCH_SIZE, DB_FLUSH_INTERVAL_MS)
+latency = LatencyTracker()
+counters = Counters()
+last_frame_at = None  # receive time of the newest frame, for stall detection
+async_pending = set()  # in-flight frame tasks in async mode
+metrics_rate_sample = (time.time(), 0)  # (time, frames_received) at the previous scrape
+metrics_rate_lock = Lock()  # scrapes run on the metrics server's handler threads
+current_ws = None
+current_ws_thread = None  # the thread running current_ws, the only producer into the frame rings
+feed_recorder = None  # set in main when RECORD_FEED is on
+log_listener = None  # background thread that does the actual log i/o, see setup_logging
+frame_rings = None  # multiprocess mode: one FrameRing per parse process
+next_ring = 0
+parse_processes = []
+detection_process = None
+hit_queue = None  # multiprocess mode: whale hits from the parse processes to the detection process
+child_log_listener = None  # multiprocess mode: forwards log records from the child processes
+stats_queue = None  # multiprocess mode: stats snapshots from the detection process
+stats_receiver = None  # multiprocess mode: thread keeping detection_stats current
+detection_stats = None  # multiprocess mode: the newest snapshot, see detection_stats_snapshot
+frame_logger = logging.getLogger("simulator.frames")  # sampled raw-frame channel
+frame_log_counter = itertools.count()
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    queue handler that enqueues the record untouched. the stock handler formats
+    the message on the calling thread; here the %-args are only merged by the
+    listener thread. safe because the queue never leaves this process.
+    """
+
+    def prepare(self, record):
+        return record
+
 # new function to set up logging
 def setup_logging():
     """
     configures logging to print to both console and the log file.
+    callers only put records on an in-memory queue; a listener thread does the
+    formatting and the file/console writes, so slow disk or terminal i/o never
+    stalls the receive path. raw frames go to their own sampled log file.
     """
+    global log_listener
     try:
         # ensure the 'logs' directory exists
         SIMULATOR_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
 
         # set logging level
         level = logging.DEBUG if DEBUG_MODE else logging.INFO
+        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
 
-        # basic config sets up the root logger
         # using 'w' filemode to clear the log on each new run
-        logging.basicConfig(
-            level=level,
-            format="%(asctime)s - %(levelname)s - %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-            handlers=[
-                logging.FileHandler(SIMULATOR_LOG_FILE, mode='w'), # writes to the file
-                logging.StreamHandler(sys.stdout) # writes to the console
-            ]
-        )
+        file_handler = logging.FileHandler(SIMULATOR_LOG_FILE, mode='w')  # writes to the file
+        console_handler = logging.StreamHandler(sys.stdout)  # writes to the console
+        output_handlers = [file_handler, console_handler]
+        for handler in output_handlers:
+            handler.setFormatter(formatter)
+            handler.addFilter(lambda record: record.name != frame_logger.name)
+
+        if DEBUG_MODE:
+            FRAME_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+            frame_handler = logging.FileHandler(FRAME_LOG_FILE, mode='w')
+            frame_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"))
+            frame_handler.addFilter(lambda record: record.name == frame_logger.name)
+            output_handlers.append(frame_handler)
+
+        # one unbounded in-memory queue feeds every handler from the listener thread
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        root.setLevel(level)
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(LazyQueueHandler(log_queue))
+
+        # raw frames skip the main log and console entirely
+        frame_logger.setLevel(logging.DEBUG if DEBUG_MODE else logging.CRITICAL)
+        frame_logger.propagate = False
+        frame_logger.addHandler(LazyQueueHandler(log_queue))
+
+        log_listener = QueueListener(log_queue, *output_handlers, respect_handler_level=True)
+        log_listener.start()
+        # flush whatever is still queued on any exit, including sys.exit() on startup errors
+        atexit.register(stop_logging)
 
         logging.info("logging setup complete.")
 
@@ -69,6 +624,35 @@ def setup_logging():
         print(f"fatal error: could not set up logging. {e}")
         sys.exit(1)
 
+def stop_logging():
+    """writes out every queued log record and stops the listener thread."""
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+def log_raw_frame(message):
+    """sends every FRAME_LOG_SAMPLE_EVERY-th raw frame to the frame log."""
+    if next(frame_log_counter) % FRAME_LOG_SAMPLE_EVERY == 0:
+        frame_logger.debug("%s", message)
+
+
+def top_whales(report_df, top_n=TOP_N_WHALES):
+    """
+    picks the watchlist from a whale report: the top_n wallets by summed
+    total_pnl, as a lowercase frozenset. fake_feed_server.py uses it too.
+    """
+    top_wallets_df = report_df.groupby('user')['total_pnl'].sum().nlargest(top_n).reset_index()
+
+    # convert all whale addresses to lowercase for reliable matching
+    return frozenset(top_wallets_df['user'].str.lower().unique())
+
+def read_whale_report():
+    """
+    reads the top n whale wallets from the whale_report.csv file.
+    returns them as a lowercase frozenset.
+    """
+    return top_whales(pd.read_csv(WHALE_REPORT_FILE))
 
 def load_whales():
     """
@@ -81,17 +665,64 @@ def load_whales():
         sys.exit(1)
 
     logging.info(f"loading top {TOP_N_WHALES} whales from '{WHALE_REPORT_FILE}'...")
-    df = pd.read_csv(WHALE_REPORT_FILE)
-    top_wallets_df = df.groupby('user')['total_pnl'].sum().nlargest(TOP_N_WHALES).reset_index()
-
-    # convert all whale addresses to lowercase for reliable matching
-    whale_wallets = set(top_wallets_df['user'].str.lower().unique())
+    whale_wallets = read_whale_report()
 
     logging.info(f"successfully loaded {len(whale_wallets)} unique whale wallets to monitor.")
 
+def get_whale_report_signature():
+    """returns (mtime, size) of the whale report, or none if it's missing."""
+    try:
+        stat = os.stat(WHALE_REPORT_FILE)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+def watch_whale_report():
+    """
+    background thread: polls the whale report and, when it changes, rebuilds
+    the watchlist off the hot path and swaps it in with a single assignment.
+    message handlers read the global once per frame, so they always see either
+    the old or the new list, never a partial one, and never take a lock.
+    """
+    global whale_wallets
+    last_signature = get_whale_report_signature()
+
+    while True:
+        time.sleep(WHALE_RELOAD_INTERVAL)
+        signature = get_whale_report_signature()
+        if signature is None or signature == last_signature:
+            continue
+
+        try:
+            new_wallets = read_whale_report()
+        except Exception as e:
+            # most likely find_whales.py is still writing it; try again next poll
+            logging.warning(f"could not reload whale report, keeping current watchlist: {e}")
+            continue
+
+        last_signature = signature
+        if not new_wallets:
+            logging.warning("reloaded whale report is empty, keeping current watchlist.")
+            continue
+
+        old_wallets = whale_wallets
+        whale_wallets = new_wallets
+        logging.info(
+            f"whale watchlist reloaded: {len(new_wallets)} wallets "
+            f"(+{len(new_wallets - old_wallets)} / -{len(old_wallets - new_wallets)})."
+        )
+
+def start_whale_watcher():
+    """starts the whale report watcher thread if hot reload is enabled."""
+    if WHALE_RELOAD_INTERVAL <= 0:
+        return
+    watcher = Thread(target=watch_whale_report, name="whale-watcher", daemon=True)
+    watcher.start()
+    logging.info(f"watching '{WHALE_REPORT_FILE}' for changes every {WHALE_RELOAD_INTERVAL}s.")
+
 def setup_database():
     """
-    creates the sqlite database and the 'trades' table if it doesn't exist.
+    opens the sqlite database and applies any pending schema migrations.
     """
     global db_conn
     try:
@@ -99,76 +730,218 @@ def setup_database():
         db_conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False)
         cursor = db_conn.cursor()
 
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS trades (
-                                                             id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                                                             whale_wallet TEXT NOT NULL,
-                                                             market_id TEXT NOT NULL,
-                                                             question TEXT,
-                                                             outcome TEXT NOT NULL,
-                                                             side TEXT NOT NULL,
-                                                             price REAL NOT NULL,
-                                                             simulated_bet REAL NOT NULL,
-                                                             is_resolved INTEGER DEFAULT 0,
-                                                             pnl REAL DEFAULT 0
-                       )
-                       ''')
-        
-        # add question column if it doesn't exist (for existing databases)
-        try:
-            cursor.execute("ALTER TABLE trades ADD COLUMN question TEXT")
-        except sqlite3.OperationalError:
-            # column already exists, ignore
-            pass
-
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS pnl_history (
-                                                                  id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                                  timestamp DATE UNIQUE,
-                                                                  cumulative_pnl REAL NOT NULL
-                       )
-                       ''')
-
-        db_conn.commit()
-        logging.info(f"database '{DATABASE_FILE}' is ready.")
+        # wal lets the writer thread, the analyzer and the dashboard work concurrently,
+        # and with synchronous=NORMAL a commit no longer costs an fsync
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+
+        # tables, columns and indexes are versioned in migrations.py
+        version = migrate(db_conn)
+        logging.info(f"database '{DATABASE_FILE}' is ready (schema version {version}).")
 
     except sqlite3.Error as e:
         logging.error(f"error setting up database: {e}")
         sys.exit(1)
 
-def fetch_market_info(market_id):
+def load_recent_trade_keys():
     """
-    fetches the market info from the polymarket api.
-    returns a dict with question, closed status, and endDate, or none if not found.
+    seeds the de-duplication set with the fills logged in the last DEDUP_WINDOW,
+    so a restart doesn't copy a fill the feed replays on reconnect.
     """
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=DEDUP_WINDOW)).strftime('%Y-%m-%d %H:%M:%S')
     try:
-        time.sleep(0.1)  # rate limit: small delay to avoid hammering api
-        params = {'condition_ids': market_id}
+        rows = db_conn.execute('''
+                               SELECT tx_hash, whale_wallet FROM trades
+                               WHERE tx_hash IS NOT NULL AND timestamp >= ?
+                               ORDER BY id DESC LIMIT ?
+                               ''', (cutoff, DEDUP_MAX_SIZE)).fetchall()
+    except sqlite3.Error as e:
+        logging.warning(f"could not load recent trades for de-duplication: {e}")
+        return
+    trade_dedup.load(trade_key(tx_hash, wallet) for tx_hash, wallet in reversed(rows))
+    logging.info(f"de-duplication: loaded {len(rows)} fills from the last {DEDUP_WINDOW}s.")
+
+def fetch_market_info_from_api(market_id):
+    """
+    fetches the market info from the polymarket api.
+    returns a dict with question, closed status, and endDate, or none if the
+    api doesn't know the market. network/http errors are raised to the caller.
+    """
+    time.sleep(0.1)  # rate limit: small delay to avoid hammering api
+    params = {'condition_ids': market_id}
+    with gamma_api_call():
         response = api_session.get(MARKETS_URL, params=params, timeout=5)
         response.raise_for_status()
         markets_data = response.json()
-        
-        if isinstance(markets_data, list) and len(markets_data) > 0:
-            market = markets_data[0]
-            if market.get('conditionId') == market_id:
-                return {
-                    'question': market.get('question'),
-                    'closed': market.get('closed', False),
-                    'endDate': market.get('endDate'),
-                    'umaResolutionStatus': market.get('umaResolutionStatus')
-                }
-        
+    return parse_market_info(markets_data, market_id)
+
+@contextmanager
+def gamma_api_call():
+    """times one gamma api request and counts it (and any error) for the metrics endpoint."""
+    start = time.time()
+    counters.inc('gamma_api_requests')
+    try:
+        yield
+    except Exception:
+        counters.inc('gamma_api_errors')
+        raise
+    finally:
+        latency.record('gamma_api', time.time() - start)
+
+def parse_market_info(markets_data, market_id):
+    """
+    pulls the fields we care about out of a /markets response for one market,
+    and queues the market for the markets table. returns none if the response
+    doesn't contain that market.
+    """
+    if isinstance(markets_data, list) and len(markets_data) > 0:
+        market = markets_data[0]
+        if market.get('conditionId') == market_id:
+            trade_writer.submit_market(market)
+            return market_to_info(market)
+
+    return None
+
+def market_to_info(market):
+    """converts one market from the /markets api into the dict we cache."""
+    return {
+        'question': market.get('question'),
+        'closed': market.get('closed', False),
+        'endDate': market.get('endDate'),
+        'umaResolutionStatus': market.get('umaResolutionStatus')
+    }
+
+def fetch_market_info_batch(market_ids):
+    """
+    bulk-fetches market info for many markets using the same comma-joined
+    condition_ids query as daily_analyzer.fetch_market_results, and stores
+    every market found in the market cache. returns how many were cached.
+    markets missing from a response are left for the normal lazy lookup.
+    """
+    cached = 0
+    for i in range(0, len(market_ids), METADATA_BATCH_SIZE):
+        batch_ids = market_ids[i : i + METADATA_BATCH_SIZE]
+        try:
+            params = {'condition_ids': ",".join(batch_ids)}
+            with gamma_api_call():
+                response = api_session.get(MARKETS_URL, params=params, timeout=10)
+                response.raise_for_status()
+                markets_data = response.json()
+        except Exception as e:
+            logging.warning(f"error bulk-fetching market info for batch {i}: {e}")
+            continue
+
+        if not isinstance(markets_data, list):
+            logging.warning(f"api did not return a list for batch {i}")
+            continue
+
+        wanted = set(batch_ids)
+        for market in markets_data:
+            condition_id = market.get('conditionId')
+            if condition_id in wanted:
+                market_cache.put(condition_id, market_to_info(market))
+                trade_writer.submit_market(market)
+                cached += 1
+
+    return cached
+
+def fetch_whale_position_markets(wallet):
+    """returns the conditionIds of markets a whale currently holds a position in."""
+    try:
+        params = {'user': wallet, 'limit': WARMUP_POSITIONS_LIMIT}
+        response = api_session.get(POSITIONS_API_URL, params=params, timeout=10)
+        response.raise_for_status()
+        positions = response.json()
+    except Exception as e:
+        logging.debug(f"error fetching positions for {wallet[:8]}...: {e}")
+        return set()
+
+    if not isinstance(positions, list):
+        return set()
+    return {p.get('conditionId') for p in positions if p.get('conditionId')}
+
+def get_open_trade_market_ids():
+    """returns the markets that still have open (is_resolved = 0) simulated trades."""
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT DISTINCT market_id FROM trades WHERE is_resolved = 0")
+    return {row[0] for row in cursor.fetchall()}
+
+def warm_market_cache():
+    """
+    fills the market cache before subscribing, so the first burst of whale
+    trades after a (re)start hits a warm cache instead of one-by-one lookups.
+    covers every market with open trades plus the watchlist's current positions.
+    """
+    start = time.monotonic()
+    market_ids = get_open_trade_market_ids()
+    logging.info(f"warm-up: {len(market_ids)} markets with open simulated trades.")
+
+    if WARMUP_WHALE_POSITIONS and whale_wallets:
+        logging.info(f"warm-up: fetching current positions for {len(whale_wallets)} whales...")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=WARMUP_MAX_WORKERS) as executor:
+            for position_markets in executor.map(fetch_whale_position_markets, whale_wallets):
+                market_ids |= position_markets
+
+    # the markets table already knows most of them. closed markets never change and
+    # open ones are reused if refreshed within the cache ttl; only the rest hit the api.
+    with db_read_lock:
+        stored = load_markets(db_conn, market_ids, max_age=MARKET_CACHE_TTL)
+    for condition_id, market in stored.items():
+        market_cache.put(condition_id, market_to_info(market))
+    logging.info(f"warm-up: {len(stored)} markets loaded from the markets table.")
+
+    cached = len(stored) + fetch_market_info_batch(sorted(market_ids - stored.keys()))
+    logging.info(f"warm-up: cached {cached}/{len(market_ids)} markets in {time.monotonic() - start:.1f}s.")
+
+def load_stored_market_info(market_id):
+    """
+    returns the market info the markets table has for a market, or none if it
+    isn't stored or is an open market refreshed longer than MARKET_CACHE_TTL
+    ago (the warm-up's rule). what it finds goes into the market cache.
+    """
+    try:
+        with db_read_lock:
+            market = load_markets(db_conn, [market_id], max_age=MARKET_CACHE_TTL).get(market_id)
+    except sqlite3.Error as e:
+        logging.debug("error reading market %s... from the markets table: %s", market_id[:8], e)
         return None
+    if market is None:
+        return None
+    market_info = market_to_info(market)
+    market_cache.put(market_id, market_info)
+    return market_info
+
+def fetch_market_info(market_id):
+    """
+    returns the market info for a market, going through the shared
+    market cache, then the markets table, before the api. only successful
+    lookups are cached (including 'not found'); api errors are retried on
+    the next call.
+    """
+    found, market_info = market_cache.get(market_id)
+    if found:
+        return market_info
+
+    market_info = load_stored_market_info(market_id)
+    if market_info is not None:
+        return market_info
+
+    try:
+        market_info = fetch_market_info_from_api(market_id)
     except Exception as e:
-        logging.debug(f"error fetching market info for {market_id[:8]}...: {e}")
+        logging.debug("error fetching market info for %s...: %s", market_id[:8], e)
         return None
 
-def log_trade(trade_data, whale_wallet):
+    market_cache.put(market_id, market_info)
+    return market_info
+
+def record_trade(trade_data, whale_wallet, market_info_lookup, timing=None):
     """
-    called when a whale trade is detected. inserts it into the database.
+    validates a whale trade and queues it for the database writer.
+    market_info_lookup(market_id) returns the market info (or none); it is
+    only called once the trade data is known to be complete. timing holds the
+    trade's stage timestamps (see on_message) and is stored with the row.
     """
-    global db_conn
     try:
         market_id = trade_data.get('conditionId')
         outcome = trade_data.get('outcome')
@@ -180,13 +953,13 @@ def log_trade(trade_data, whale_wallet):
         price = float(price_str)
 
         if not all([whale_wallet, market_id, outcome, side, price is not None]):
-            logging.debug(f"skipping incomplete trade data: {trade_data}")
+            logging.debug("skipping incomplete trade data: %s", trade_data)
             return
 
-        # fetch market info from api (question, closed status, etc.)
-        market_info = fetch_market_info(market_id)
+        # fetch market info (question, closed status, etc.)
+        market_info = market_info_lookup(market_id)
         if not market_info:
-            logging.debug(f"could not fetch market info for market {market_id[:8]}...")
+            logging.debug("could not fetch market info for market %s...", market_id[:8])
             question = None
             is_closed = False
         else:
@@ -195,36 +968,41 @@ def log_trade(trade_data, whale_wallet):
             
             # print market question for verification
             if question:
-                logging.info(f"market question: {question}")
+                logging.info("market question: %s", question)
             else:
-                logging.warning(f"market {market_id[:8]}... has no question field")
+                logging.warning("market %s... has no question field", market_id[:8])
 
-        logging.info(f"whale trade detected! [wallet: {whale_wallet[:8]}... | market: {market_id[:8]}... | {side} {outcome} @ {price:.2f}]")
+        logging.info("whale trade detected! [wallet: %s... | market: %s... | %s %s @ %.2f]",
+                     whale_wallet[:8], market_id[:8], side, outcome, price)
 
-        cursor = db_conn.cursor()
-        cursor.execute('''
-                       INSERT INTO trades (whale_wallet, market_id, question, outcome, side, price, simulated_bet)
-                       VALUES (?, ?, ?, ?, ?, ?, ?)
-                       ''', (whale_wallet, market_id, question, outcome, side, price, SIMULATED_BET_AMOUNT))
-        db_conn.commit()
+        # stamp the detection time here (same format as CURRENT_TIMESTAMP), not at commit time
+        now = time.time()
+        detected_at = datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        timing = timing or {}
+        exchange_ts = timing.get('exchange')
+        received_ts = timing.get('received')
+        detect_latency_ms = (now - received_ts) * 1000 if received_ts else None
+        copy_latency_ms = (now - exchange_ts) * 1000 if exchange_ts else None
 
-        logging.info(f"   -> simulated $1.00 trade logged to database.")
+        # stored lowercased, like the de-duplication keys: the unique (tx_hash, whale_wallet)
+        # index is case-sensitive, and the feed doesn't always spell a fill the same way
+        tx_hash = trade_data.get('transactionHash')
+        trade_writer.submit((detected_at, whale_wallet.lower(), market_id, outcome, side, price, SIMULATED_BET_AMOUNT,
+                             exchange_ts, received_ts, timing.get('metadata_ms'), detect_latency_ms, copy_latency_ms,
+                             tx_hash.lower() if tx_hash else None),
+                            timing)
 
-    except sqlite3.Error as e:
-        logging.error(f"error logging trade to database: {e}")
     except Exception as e:
-        logging.error(f"error parsing trade data: {e} | data: {trade_data}")
+        logging.error("error parsing trade data: %s | data: %s", e, trade_data)
 
-def is_market_active(market_id):
+def market_info_is_active(market_id, market_info):
     """
-    checks if a market is still active (not closed/resolved).
-    returns true if market is active, false if it's already resolved.
+    decides from already-fetched market info whether a market is still active.
     """
     try:
-        market_info = fetch_market_info(market_id)
         if not market_info:
             # if we can't fetch market info, assume it's active (better to process than skip)
-            logging.debug(f"could not fetch market info for {market_id[:8]}..., assuming active")
+            logging.debug("could not fetch market info for %s..., assuming active", market_id[:8])
             return True
         
         # check if market is closed
@@ -233,67 +1011,218 @@ def is_market_active(market_id):
         
         # market is active if it's not closed and not resolved
         if is_closed:
-            logging.debug(f"market {market_id[:8]}... is closed, skipping trade")
+            logging.debug("market %s... is closed, skipping trade", market_id[:8])
             return False
         
         if resolution_status and resolution_status.upper() in ['FINAL', 'RESOLVED', 'RESOLVED_FINAL']:
-            logging.debug(f"market {market_id[:8]}... is resolved ({resolution_status}), skipping trade")
+            logging.debug("market %s... is resolved (%s), skipping trade", market_id[:8], resolution_status)
             return False
         
         # market is active
         return True
     except Exception as e:
-        logging.debug(f"error checking market status for {market_id[:8]}...: {e}")
+        logging.debug("error checking market status for %s...: %s", market_id[:8], e)
         # if we can't check, assume it's active (better to process than skip)
         return True
 
+def frame_mentions_whale(message, wallets):
+    """
+    prefilter: scans the raw frame text for any watchlist address before we
+    pay for json.loads. only a frame that names a whale somewhere can produce
+    a detection, so everything else is dropped here.
+    """
+    addresses = ADDRESS_PATTERN.findall(message)
+    return bool(addresses) and not wallets.isdisjoint(map(str.lower, addresses))
+
+def trade_key(tx_hash, wallet):
+    return tx_hash.lower(), wallet.lower()
+
+def is_duplicate_trade(trade, whale_wallet):
+    """
+    true if this (transactionHash, whale wallet) fill was already seen within
+    DEDUP_WINDOW. trades without a hash can't be matched and always pass.
+    """
+    tx_hash = trade.get('transactionHash')
+    if not tx_hash:
+        return False
+    if trade_dedup.add_if_new(trade_key(tx_hash, whale_wallet)):
+        return False
+    counters.inc('duplicate_trades')
+    return True
+
+def find_whale_wallet(trade, wallets):
+    """
+    returns the whale wallet involved in a trade, or none.
+    the taker is checked first, then each maker order.
+    """
+    # check 1: is the taker one of our whales? (convert to lowercase)
+    taker_wallet = trade.get('proxyWallet')
+    if taker_wallet and taker_wallet.lower() in wallets:
+        return taker_wallet
+
+    # check 2: is the maker one of our whales? (convert to lowercase)
+    for maker_order in trade.get('maker_orders') or []:
+        maker_wallet = maker_order.get('maker_address')
+        if maker_wallet and maker_wallet.lower() in wallets:
+            return maker_wallet
+
+    return None
+
 def on_message(ws, message):
     """
     main websocket callback function for the rtds.
+    runs on the websocket thread, so it only prefilters and enqueues;
+    the real work happens in process_message on the worker pool.
     """
-    global whale_wallets
+    global last_frame_at
+    received_at = time.time()
+    last_frame_at = received_at
+    counters.inc('frames_received')
+
+    if feed_recorder is not None:
+        feed_recorder.record(message, received_at)
+
+    if frame_rings is not None:
+        # multiprocess mode: decoding, prefiltering and parsing happen in the parse processes
+        if DEBUG_MODE:
+            log_raw_frame(message)
+        dispatch_frame(message, received_at)
+        return
+
+    if isinstance(message, bytes):
+        message = message.decode('utf-8', errors='replace')
+    if DEBUG_MODE:
+        log_raw_frame(message)
 
-    logging.debug(message) # will only print if debug_mode is on
+    # cheap raw-text prefilter: the vast majority of frames involve no whale
+    if not frame_mentions_whale(message, whale_wallets):
+        return
 
+    prefiltered_at = time.time()
+    latency.record('prefilter', prefiltered_at - received_at)
+    counters.inc('frames_prefilter_passed')
+
+    if not ingest_queue.put((message, {'received': received_at, 'prefiltered': prefiltered_at})):
+        logging.debug("ingest queue full, dropped a frame")
+
+def get_exchange_timestamp(data, trade):
+    """
+    returns the exchange-side time of a trade in epoch seconds, or none.
+    the frame carries milliseconds; the payload carries seconds.
+    """
+    ts = data.get('timestamp') or trade.get('timestamp')
     try:
-        data = json.loads(message)
+        ts = float(ts)
+    except (TypeError, ValueError):
+        return None
+    return ts / 1000.0 if ts > 1e11 else ts
 
-        if data.get("topic") == "activity" and data.get("type") == "orders_matched":
-            trade = data.get("payload")
-            if not trade:
-                return
+def match_whale_trade(message, wallets):
+    """
+    decodes a prefiltered frame. returns (trade, market_id, whale_wallet, exchange_ts)
+    if it is an orders_matched trade involving one of our whales, otherwise none.
+    """
+    data = json.loads(message)
 
-            market_id = trade.get('conditionId')
-            if not market_id:
-                return
+    if data.get("topic") != "activity" or data.get("type") != "orders_matched":
+        return None
 
-            # filter out trades for markets that are already closed/resolved
-            if not is_market_active(market_id):
-                logging.debug(f"skipping trade for resolved/closed market: {market_id[:8]}...")
-                return
+    trade = data.get("payload")
+    if not trade:
+        return None
 
-            # check 1: is the taker one of our whales? (convert to lowercase)
-            taker_wallet = trade.get('proxyWallet')
-            if taker_wallet and taker_wallet.lower() in whale_wallets:
-                log_trade(trade, taker_wallet)
-                return
+    market_id = trade.get('conditionId')
+    if not market_id:
+        return None
 
-            # check 2: is the maker one of our whales? (convert to lowercase)
-            maker_orders = trade.get('maker_orders', [])
-            if not maker_orders:
-                return
+    whale_wallet = find_whale_wallet(trade, wallets)
+    if not whale_wallet:
+        return None
 
-            for maker_order in maker_orders:
-                maker_wallet = maker_order.get('maker_address')
-                if maker_wallet and maker_wallet.lower() in whale_wallets:
-                    log_trade(trade, maker_wallet)
-                    break
+    return trade, market_id, whale_wallet, get_exchange_timestamp(data, trade)
+
+def process_message(item):
+    """
+    decodes a prefiltered frame and logs the trade if a whale is involved
+    and the market is still active. runs on an ingest worker thread.
+    item is (message, timing) as queued by on_message.
+    """
+    message, timing = item
+    latency.record('queue_wait', time.time() - timing['prefiltered'])
+
+    # read the watchlist once so the whole frame is judged against one version
+    wallets = whale_wallets
+
+    try:
+        match = match_whale_trade(message, wallets)
+        if not match:
+            return
+        handle_whale_trade(match, timing)
 
     except json.JSONDecodeError:
         pass
     except Exception as e:
-        logging.error(f"error in on_message: {e}")
-        logging.debug(f"problematic message: {message}")
+        logging.error("error in process_message: %s", e)
+        logging.debug("problematic message: %s", message)
+
+def admit_whale_trade(match, timing):
+    """
+    first half of handling a whale trade, shared by every pipeline: unpacks a
+    match_whale_trade result into timing and drops repeats of a fill we
+    already have. returns (trade, market_id, whale_wallet), or none to skip it.
+    """
+    trade, market_id, whale_wallet, timing['exchange'] = match
+    if timing['exchange']:
+        latency.record('feed_delay', timing['received'] - timing['exchange'])
+
+    # repeats of a fill we already have are dropped before any lookup or write
+    if is_duplicate_trade(trade, whale_wallet):
+        logging.debug("skipping duplicate fill %s for %s...", trade.get('transactionHash'), whale_wallet[:8])
+        return None
+    return trade, market_id, whale_wallet
+
+def copy_whale_trade(trade, market_id, whale_wallet, market_info, lookup_start, timing):
+    """
+    second half, once the pipeline has looked up the market (started at
+    lookup_start): records the lookup time, skips markets that are already
+    closed/resolved, and queues the trade for the writer.
+    """
+    metadata_elapsed = time.time() - lookup_start
+    latency.record('metadata', metadata_elapsed)
+    timing['metadata_ms'] = metadata_elapsed * 1000
+
+    if not market_info_is_active(market_id, market_info):
+        logging.debug("skipping trade for resolved/closed market: %s...", market_id[:8])
+        return
+
+    record_trade(trade, whale_wallet, lambda _: market_info, timing)
+
+def handle_whale_trade(match, timing):
+    """
+    takes a whale trade from match_whale_trade through de-duplication and the
+    market status check, and logs it if the market is still active. the
+    market lookup blocks (threaded and multiprocess modes).
+    """
+    admitted = admit_whale_trade(match, timing)
+    if not admitted:
+        return
+    trade, market_id, whale_wallet = admitted
+
+    # done after the whale and dedup checks so we only look up markets we'd copy
+    lookup_start = time.time()
+    market_info = fetch_market_info(market_id)
+    copy_whale_trade(trade, market_id, whale_wallet, market_info, lookup_start, timing)
+
+def log_latency_report():
+    """
+    logs p50/p99/max per pipeline stage for the window since the last report,
+    then starts a new window.
+    """
+    lines = format_summaries(latency.report_and_reset())
+    if lines:
+        logging.info("latency since last report:")
+        for line in lines:
+            logging.info("   " + line)
 
 def on_error(ws, error):
     """
@@ -329,7 +1258,14 @@ def on_open(ws):
     # reset reconnect delay on successful connection
     reconnect_delay = 5
 
-    subscribe_message = {
+    ws.send(json.dumps(build_subscribe_message()))
+    logging.info("sent authenticated subscription request for 'activity' feed.")
+    logging.info(f"bot is now silently listening... (will print '.' every {HEARTBEAT_INTERVAL}s if DEBUG_MODE is on)")
+    logging.info("note: connection issues will auto-reconnect silently")
+
+def build_subscribe_message():
+    """builds the authenticated subscription request for the 'activity' feed."""
+    return {
         "action": "subscribe",
         "subscriptions": [
             {
@@ -344,16 +1280,11 @@ def on_open(ws):
         ]
     }
 
-    ws.send(json.dumps(subscribe_message))
-    logging.info("sent authenticated subscription request for 'activity' feed.")
-    logging.info(f"bot is now silently listening... (will print '.' every {HEARTBEAT_INTERVAL}s if DEBUG_MODE is on)")
-    logging.info("note: connection issues will auto-reconnect silently")
-
 def start_websocket():
     """
     initializes and runs the websocket client.
     """
-    global reconnect_delay
+    global reconnect_delay, current_ws, current_ws_thread
     max_reconnect_delay = 60  # max delay of 60 seconds
     
     while True:
@@ -366,6 +1297,7 @@ def start_websocket():
                 on_error=on_error,
                 on_close=on_close
             )
+            current_ws = ws
 
             # disable automatic ping/pong - the server may handle keepalive differently
             # or we can rely on the server's own keepalive mechanism
@@ -375,6 +1307,7 @@ def start_websocket():
                 "ping_timeout": None
             })
             wst.daemon = True
+            current_ws_thread = wst
             wst.start()
 
             # --- heartbeat thread ---
@@ -383,6 +1316,10 @@ def start_websocket():
             while wst.is_alive():
                 time.sleep(HEARTBEAT_INTERVAL)
                 logging.debug(".")  # prints a dot to the log in debug mode
+                logging.debug(f"market cache: {market_cache.stats()}")
+                logging.debug(f"ingest queue: {ingest_queue.stats()}")
+                logging.debug(f"trade writer: {trade_writer.stats()}")
+                log_latency_report()
             # --- end heartbeat ---
 
         except Exception as e:
@@ -390,6 +1327,7 @@ def start_websocket():
             import traceback
             traceback.print_exc()
 
+        counters.inc('websocket_reconnects')
         # reconnect immediately on first attempt, then use exponential backoff
         if reconnect_delay > 5:
             logging.warning(f"connection lost. reconnecting in {reconnect_delay} seconds...")
@@ -401,6 +1339,515 @@ def start_websocket():
         # exponential backoff for reconnection delay (cap at max)
         reconnect_delay = min(reconnect_delay * 1.5, max_reconnect_delay)
 
+# --- multiprocess mode ---
+def dispatch_frame(message, received_at):
+    """
+    copies a raw frame into the next parse process's ring (round robin),
+    trying the other rings before giving up on it. runs on the websocket thread,
+    which is the only producer for every ring.
+    """
+    global next_ring
+    data = message.encode('utf-8') if isinstance(message, str) else message
+    for _ in range(len(frame_rings)):
+        ring = frame_rings[next_ring]
+        next_ring = (next_ring + 1) % len(frame_rings)
+        if ring.push(data, received_at):
+            return
+    if QUEUE_FULL_POLICY == "block" and frame_rings[next_ring].push(data, received_at, QUEUE_BLOCK_TIMEOUT):
+        return
+    counters.inc('frames_ring_dropped')
+    logging.debug("all frame rings full, dropped a frame")
+
+def init_child_process(log_queue):
+    """
+    common setup for the multiprocess-mode children. ctrl+c is left to the
+    parent, which stops the children in order, and log records go back to the
+    parent over log_queue so there is still one log file.
+    """
+    global log_listener
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    log_listener = None  # the parent's listener thread doesn't exist in this process
+    for logger in (logging.getLogger(), frame_logger):
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+    logging.getLogger().addHandler(QueueHandler(log_queue))
+    logging.getLogger().setLevel(logging.DEBUG if DEBUG_MODE else logging.INFO)
+
+def parse_process_main(ring, hits, log_queue):
+    """
+    parse process: prefilters and decodes the frames in its ring and sends
+    (match, timing) for every whale trade to the detection process. keeps its
+    own copy of the watchlist, hot-reloaded like the parent's.
+    """
+    init_child_process(log_queue)
+    load_whales()
+    start_whale_watcher()
+
+    while True:
+        item = ring.get()
+        if item is None:
+            break
+        received_at, data = item
+        message = data.decode('utf-8', errors='replace')
+        wallets = whale_wallets
+        if not frame_mentions_whale(message, wallets):
+            continue
+        prefiltered_at = time.time()
+        try:
+            match = match_whale_trade(message, wallets)
+        except json.JSONDecodeError:
+            continue
+        except Exception as e:
+            logging.error("error in parse process: %s", e)
+            logging.debug("problematic message: %s", message)
+            continue
+        if match:
+            hits.put((match, {'received': received_at, 'prefiltered': prefiltered_at}))
+
+def process_hit(item):
+    """ingest worker handler in the detection process. item is (match, timing)."""
+    match, timing = item
+    latency.record('queue_wait', time.time() - timing['prefiltered'])
+    try:
+        handle_whale_trade(match, timing)
+    except Exception as e:
+        logging.error("error in process_hit: %s", e)
+
+def detection_stats_snapshot():
+    """
+    the stats the metrics endpoint reads from the ingest queue, market cache,
+    writer, de-duplication and latency tracker, plus the counters bumped next
+    to them. in multiprocess mode these live in the detection process, which
+    sends a snapshot to the parent every STATS_PUBLISH_INTERVAL.
+    """
+    return {
+        'ingest': ingest_queue.stats(),
+        'cache': market_cache.stats(),
+        'writer': trade_writer.stats(),
+        'dedup': trade_dedup.stats(),
+        'latency': latency.summaries(),
+        'counters': {name: counters.get(name) for name in ('duplicate_trades', 'gamma_api_requests', 'gamma_api_errors')},
+    }
+
+def receive_detection_stats(snapshots):
+    """parent thread: keeps detection_stats at the newest snapshot until the none sentinel."""
+    global detection_stats
+    while True:
+        snapshot = snapshots.get()
+        if snapshot is None:
+            break
+        detection_stats = snapshot
+
+def detection_process_main(hits, log_queue, ready, snapshots):
+    """
+    detection process: the single consumer of whale hits. runs the same
+    de-duplication, market checks and group-committed writes as the threaded
+    mode, so the trades it logs are the same. its stats go to the parent over
+    snapshots, for the metrics endpoint.
+    """
+    init_child_process(log_queue)
+    # only the warm-up reads the watchlist here (the parse processes do the matching),
+    # but it must be loaded, not inherited: spawn/forkserver children start from a fresh import
+    load_whales()
+    setup_database()
+    load_recent_trade_keys()
+    warm_market_cache()
+    trade_writer.start()
+    ingest_queue.start_workers(NUM_WORKERS, process_hit)
+    ready.set()
+
+    snapshots.put(detection_stats_snapshot())
+    next_report = time.monotonic() + HEARTBEAT_INTERVAL
+    next_publish = time.monotonic() + STATS_PUBLISH_INTERVAL
+    while True:
+        try:
+            item = hits.get(timeout=max(0.0, min(next_report, next_publish) - time.monotonic()))
+        except queue.Empty:
+            item = ()
+        if item is None:  # shutdown sentinel, sent after every parse process has exited
+            break
+        if item and not ingest_queue.put(item):
+            logging.debug("ingest queue full, dropped a whale hit")
+        if time.monotonic() >= next_publish:
+            next_publish = time.monotonic() + STATS_PUBLISH_INTERVAL
+            snapshots.put(detection_stats_snapshot())
+        if time.monotonic() >= next_report:
+            next_report = time.monotonic() + HEARTBEAT_INTERVAL
+            logging.debug(f"market cache: {market_cache.stats()}")
+            logging.debug(f"ingest queue: {ingest_queue.stats()}")
+            logging.debug(f"trade writer: {trade_writer.stats()}")
+            log_latency_report()
+
+    if not ingest_queue.drain_and_stop(SHUTDOWN_DRAIN_TIMEOUT):
+        logging.warning(f"detection workers did not finish within {SHUTDOWN_DRAIN_TIMEOUT}s.")
+    if not trade_writer.stop(SHUTDOWN_DRAIN_TIMEOUT):
+        logging.warning(f"trade writer did not finish within {SHUTDOWN_DRAIN_TIMEOUT}s.")
+    logging.info(f"final detection stats: ingest {ingest_queue.stats()} | writer {trade_writer.stats()} | dedup {trade_dedup.stats()}")
+    snapshots.put(detection_stats_snapshot())
+
+def start_multiprocess():
+    """starts the detection process and the parse processes, and hooks on_message up to their rings."""
+    global frame_rings, parse_processes, detection_process, hit_queue, child_log_listener, stats_queue, stats_receiver
+    log_queue = mp.Queue()
+    # records from the children are handed to this process's own (queued) handlers
+    child_log_listener = QueueListener(log_queue, *logging.getLogger().handlers)
+    child_log_listener.start()
+
+    stats_queue = mp.Queue()
+    stats_receiver = Thread(target=receive_detection_stats, args=(stats_queue,), name="detection-stats", daemon=True)
+    stats_receiver.start()
+
+    hit_queue = mp.Queue()
+    ready = mp.Event()
+    detection_process = mp.Process(target=detection_process_main, args=(hit_queue, log_queue, ready, stats_queue),
+                                   name="detector", daemon=True)
+    detection_process.start()
+    # same order as the threaded mode: the cache is warm before any frame arrives
+    while not ready.wait(timeout=1):
+        if not detection_process.is_alive():
+            logging.error("error: detection process exited during startup.")
+            sys.exit(1)
+
+    rings = [FrameRing(FRAME_RING_SLOTS, FRAME_RING_SLOT_SIZE) for _ in range(NUM_PARSE_PROCESSES)]
+    parse_processes = [
+        mp.Process(target=parse_process_main, args=(ring, hit_queue, log_queue), name=f"frame-parser-{i}", daemon=True)
+        for i, ring in enumerate(rings)
+    ]
+    for process in parse_processes:
+        process.start()
+    frame_rings = rings
+    logging.info(f"--- multiprocess mode: {NUM_PARSE_PROCESSES} parse processes + 1 detection process ---")
+
+def stop_multiprocess():
+    """
+    stops the children in pipeline order: the parse processes finish their
+    rings, then the detection process drains its hits and flushes the writer.
+    called once the websocket thread, the rings' single producer, has stopped.
+    """
+    logging.info("stopping parse processes...")
+    deadline = time.monotonic() + SHUTDOWN_DRAIN_TIMEOUT
+    clean_exit = True
+    for ring in frame_rings:
+        ring.close(timeout=max(0.0, deadline - time.monotonic()))
+    for process in parse_processes:
+        process.join(timeout=max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            logging.warning(f"{process.name} did not finish within {SHUTDOWN_DRAIN_TIMEOUT}s.")
+            process.terminate()
+            clean_exit = False
+
+    logging.info("draining detection process...")
+    hit_queue.put(None)
+    # it gets one timeout for the ingest workers and one for the writer
+    detection_process.join(timeout=SHUTDOWN_DRAIN_TIMEOUT * 2 + 5)
+    if detection_process.is_alive():
+        logging.warning("detection process did not finish in time.")
+        detection_process.terminate()
+        clean_exit = False
+
+    if clean_exit:
+        child_log_listener.stop()
+        stats_queue.put(None)
+        stats_receiver.join()
+    else:
+        # a killed child can die holding a queue lock, so don't wait on the queues at exit
+        hit_queue.cancel_join_thread()
+        child_log_listener.queue.cancel_join_thread()
+        stats_queue.cancel_join_thread()
+
+# --- asyncio mode ---
+
+class AsyncMarketInfoFetcher:
+    """
+    non-blocking metadata lookups over a pooled aiohttp session.
+    concurrent lookups for the same market share one in-flight request, and
+    results go into the same market cache the threaded pipeline uses. a miss
+    checks the markets table first (one primary-key read, done inline).
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._inflight = {}  # market_id -> task
+
+    async def get(self, market_id):
+        found, market_info = market_cache.get(market_id)
+        if found:
+            return market_info
+        market_info = load_stored_market_info(market_id)
+        if market_info is not None:
+            return market_info
+
+        task = self._inflight.get(market_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(market_id))
+            self._inflight[market_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(market_id, None))
+        # shield so one cancelled waiter doesn't cancel the lookup for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, market_id):
+        try:
+            params = {'condition_ids': market_id}
+            with gamma_api_call():
+                async with self.session.get(MARKETS_URL, params=params) as response:
+                    response.raise_for_status()
+                    markets_data = await response.json()
+            market_info = parse_market_info(markets_data, market_id)
+        except Exception as e:
+            logging.debug("error fetching market info for %s...: %s", market_id[:8], e)
+            return None
+
+        market_cache.put(market_id, market_info)
+        return market_info
+
+async def process_message_async(message, fetcher, timing):
+    """
+    asyncio twin of process_message: the same admit/copy steps as
+    handle_whale_trade, but the metadata lookup awaits instead of blocking a thread.
+    """
+    latency.record('queue_wait', time.time() - timing['prefiltered'])
+    wallets = whale_wallets
+
+    try:
+        match = match_whale_trade(message, wallets)
+        if not match:
+            return
+        admitted = admit_whale_trade(match, timing)
+        if not admitted:
+            return
+        trade, market_id, whale_wallet = admitted
+
+        lookup_start = time.time()
+        market_info = await fetcher.get(market_id)
+        copy_whale_trade(trade, market_id, whale_wallet, market_info, lookup_start, timing)
+
+    except json.JSONDecodeError:
+        pass
+    except Exception as e:
+        logging.error("error in process_message_async: %s", e)
+        logging.debug("problematic message: %s", message)
+
+async def async_heartbeat(pending):
+    """periodic liveness/stats log, same as the threaded heartbeat loop."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        logging.debug(".")
+        logging.debug(f"market cache: {market_cache.stats()}")
+        logging.debug(f"async pending frames: {len(pending)}")
+        logging.debug(f"trade writer: {trade_writer.stats()}")
+        log_latency_report()
+
+async def run_async():
+    """
+    asyncio version of start_websocket. every prefiltered frame becomes its own
+    task, so many whale trades in different markets resolve their metadata
+    concurrently instead of one after another.
+    """
+    global last_frame_at
+    reconnect_delay = 5
+    max_reconnect_delay = 60
+    pending = async_pending
+
+    connector = aiohttp.TCPConnector(limit=ASYNC_HTTP_POOL_SIZE)
+    timeout = aiohttp.ClientTimeout(total=ASYNC_HTTP_TIMEOUT)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http_session:
+        fetcher = AsyncMarketInfoFetcher(http_session)
+        heartbeat = asyncio.ensure_future(async_heartbeat(pending))
+        try:
+            while True:
+                try:
+                    logging.info(f"connecting to {WEBSOCKET_URL}...")
+                    # the websocket gets its own session so its (unbounded) lifetime
+                    # doesn't count against the metadata request timeout
+                    async with aiohttp.ClientSession() as ws_session:
+                        async with ws_session.ws_connect(WEBSOCKET_URL, heartbeat=None) as ws:
+                            logging.info("--- websocket connection opened ---")
+                            reconnect_delay = 5
+                            await ws.send_str(json.dumps(build_subscribe_message()))
+                            logging.info("sent authenticated subscription request for 'activity' feed.")
+
+                            async for msg in ws:
+                                received_at = time.time()
+                                last_frame_at = received_at
+                                counters.inc('frames_received')
+                                if msg.type == aiohttp.WSMsgType.TEXT:
+                                    message = msg.data
+                                elif msg.type == aiohttp.WSMsgType.BINARY:
+                                    message = msg.data.decode('utf-8', errors='replace')
+                                else:
+                                    break
+
+                                if DEBUG_MODE:
+                                    log_raw_frame(message)
+                                if feed_recorder is not None:
+                                    feed_recorder.record(message, received_at)
+                                if not frame_mentions_whale(message, whale_wallets):
+                                    continue
+                                prefiltered_at = time.time()
+                                latency.record('prefilter', prefiltered_at - received_at)
+                                counters.inc('frames_prefilter_passed')
+
+                                if len(pending) >= ASYNC_MAX_PENDING:
+                                    counters.inc('async_dropped')
+                                    logging.debug("too many pending frames, dropped a frame")
+                                    continue
+
+                                timing = {'received': received_at, 'prefiltered': prefiltered_at}
+                                task = asyncio.ensure_future(process_message_async(message, fetcher, timing))
+                                pending.add(task)
+                                task.add_done_callback(pending.discard)
+
+                    logging.info("websocket closed (will reconnect)")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logging.warning(f"--- websocket error: {e} ---")
+
+                counters.inc('websocket_reconnects')
+                # reconnect immediately on first attempt, then use exponential backoff
+                if reconnect_delay > 5:
+                    logging.warning(f"connection lost. reconnecting in {reconnect_delay} seconds...")
+                    await asyncio.sleep(reconnect_delay)
+                else:
+                    logging.info("connection lost. reconnecting immediately...")
+                    await asyncio.sleep(1)
+                reconnect_delay = min(reconnect_delay * 1.5, max_reconnect_delay)
+        finally:
+            heartbeat.cancel()
+            if pending:
+                logging.info(f"waiting for {len(pending)} in-flight frames...")
+                await asyncio.wait(pending, timeout=SHUTDOWN_DRAIN_TIMEOUT)
+
+# --- metrics endpoint ---
+
+def collect_metrics():
+    """
+    gathers the simulator's counters and gauges for the prometheus endpoint.
+    frames per second is measured since the previous scrape. in multiprocess
+    mode the detection-side stats come from the detection process's latest
+    snapshot, and the prefilter series and stage are left out: the parse
+    processes don't report them.
+    """
+    global metrics_rate_sample
+    with metrics_rate_lock:
+        # the sample is read and replaced together, so concurrent scrapes each get a consistent interval
+        now = time.time()
+        received = counters.get('frames_received')
+        prev_time, prev_received = metrics_rate_sample
+        frames_per_second = (received - prev_received) / (now - prev_time) if now > prev_time else 0.0
+        metrics_rate_sample = (now, received)
+    prefilter_passed = counters.get('frames_prefilter_passed')
+
+    snapshot = detection_stats if MULTIPROCESS_MODE else None
+    if snapshot is None:
+        # before the detection process's first snapshot, its idle copies in this process read zero anyway
+        snapshot = detection_stats_snapshot()
+    queue_stats = snapshot['ingest']
+    cache_stats = snapshot['cache']
+    writer_stats = snapshot['writer']
+    stage_summaries = snapshot['latency']
+    detection_counters = snapshot['counters']
+    gamma = stage_summaries['gamma_api']
+
+    stage_samples = []
+    for stage, summary in stage_summaries.items():
+        if MULTIPROCESS_MODE and stage == 'prefilter':
+            continue
+        stage_samples.append(({'stage': stage, 'quantile': '0.5'}, summary['p50_ms'] / 1000.0))
+        stage_samples.append(({'stage': stage, 'quantile': '0.99'}, summary['p99_ms'] / 1000.0))
+        stage_samples.append(({'stage': stage, 'quantile': '1'}, summary['max_ms'] / 1000.0))
+
+    prefilter_metrics = [] if MULTIPROCESS_MODE else [
+        ('polymimic_prefilter_passed_total', 'counter', 'frames that named a watched wallet.', prefilter_passed),
+        ('polymimic_prefilter_hit_ratio', 'gauge', 'share of frames passing the whale prefilter.', prefilter_passed / received if received else 0.0),
+    ]
+
+    return [
+        ('polymimic_frames_received_total', 'counter', 'websocket frames received.', received),
+        ('polymimic_frames_per_second', 'gauge', 'frames received per second since the previous scrape.', frames_per_second),
+        *prefilter_metrics,
+        ('polymimic_ingest_queue_depth', 'gauge', 'frames waiting for a worker (async mode: in-flight frame tasks).', queue_stats['depth'] + len(async_pending)),
+        ('polymimic_ingest_queue_max_depth', 'gauge', 'deepest the ingest queue has been.', queue_stats['max_depth']),
+        ('polymimic_ingest_dropped_total', 'counter', 'frames dropped because the pipeline was full.',
+         queue_stats['dropped'] + counters.get('async_dropped') + counters.get('frames_ring_dropped')),
+        ('polymimic_market_cache_lookups_total', 'counter', 'market metadata cache lookups by result.', [
+            ({'result': 'hit'}, cache_stats['hits']),
+            ({'result': 'negative_hit'}, cache_stats['negative_hits']),
+            ({'result': 'miss'}, cache_stats['misses']),
+        ]),
+        ('polymimic_market_cache_hit_ratio', 'gauge', 'share of metadata lookups served from the cache.', cache_stats['hit_ratio']),
+        ('polymimic_market_cache_size', 'gauge', 'markets held in the metadata cache.', cache_stats['size']),
+        ('polymimic_gamma_api_requests_total', 'counter', 'requests made to the gamma /markets api.', detection_counters['gamma_api_requests']),
+        ('polymimic_gamma_api_errors_total', 'counter', 'gamma api requests that failed.', detection_counters['gamma_api_errors']),
+        ('polymimic_gamma_api_latency_seconds', 'gauge', 'gamma api latency in the current latency window.', [
+            ({'quantile': '0.5'}, gamma['p50_ms'] / 1000.0),
+            ({'quantile': '0.99'}, gamma['p99_ms'] / 1000.0),
+            ({'quantile': '1'}, gamma['max_ms'] / 1000.0),
+        ]),
+        ('polymimic_duplicate_trades_total', 'counter', 'fills dropped as duplicates (in memory, and by the db unique index).', [
+            ({'where': 'memory'}, detection_counters['duplicate_trades']),
+            ({'where': 'db'}, writer_stats['duplicates_ignored']),
+        ]),
+        ('polymimic_dedup_keys', 'gauge', 'fill keys held in the de-duplication window.', snapshot['dedup']['size']),
+        ('polymimic_db_rows_written_total', 'counter', 'trade rows committed by the writer.', writer_stats['rows_written']),
+        ('polymimic_db_batches_total', 'counter', 'group commits made by the writer.', writer_stats['batches']),
+        ('polymimic_db_last_batch_size', 'gauge', 'rows in the most recent group commit.', writer_stats['last_batch_size']),
+        ('polymimic_db_max_batch_size', 'gauge', 'largest group commit so far.', writer_stats['max_batch_size']),
+        ('polymimic_db_pending_rows', 'gauge', 'rows waiting for the writer.', writer_stats['pending']),
+        ('polymimic_db_write_errors_total', 'counter', 'group commits that failed.', writer_stats['errors']),
+        ('polymimic_db_write_retries_total', 'counter', 'group commits retried after a locked/busy error.', writer_stats['retries']),
+        ('polymimic_websocket_reconnects_total', 'counter', 'websocket reconnects.', counters.get('websocket_reconnects')),
+        ('polymimic_seconds_since_last_frame', 'gauge', 'seconds since the last websocket frame (-1 before the first).', now - last_frame_at if last_frame_at else -1),
+        ('polymimic_stage_latency_seconds', 'gauge', 'pipeline stage latency in the current latency window.', stage_samples),
+    ]
+
+def start_metrics():
+    """starts the localhost metrics endpoint if enabled."""
+    if not METRICS_ENABLED:
+        return
+    try:
+        start_metrics_server(METRICS_HOST, METRICS_PORT, collect_metrics)
+        logging.info(f"metrics available at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    except OSError as e:
+        logging.warning(f"could not start metrics endpoint on port {METRICS_PORT}: {e}")
+
+def shutdown():
+    """
+    stops receiving, lets the workers drain whatever is already queued,
+    then flushes the trade writer and the feed recorder.
+    """
+    logging.info("shutting down: closing websocket...")
+    if current_ws is not None:
+        try:
+            current_ws.close()
+        except Exception as e:
+            logging.debug(f"error closing websocket: {e}")
+    # no frame may still be on its way into the queue or the rings once they start closing
+    if current_ws_thread is not None:
+        current_ws_thread.join(timeout=WEBSOCKET_STOP_TIMEOUT)
+        if current_ws_thread.is_alive():
+            logging.warning(f"websocket thread did not stop within {WEBSOCKET_STOP_TIMEOUT}s.")
+
+    if frame_rings is not None:
+        # multiprocess mode: the queue and the writer live in the detection process
+        stop_multiprocess()
+    else:
+        logging.info(f"draining ingest queue ({ingest_queue.stats()['depth']} frames pending)...")
+        if ingest_queue.drain_and_stop(SHUTDOWN_DRAIN_TIMEOUT):
+            logging.info("ingest queue drained.")
+        else:
+            logging.warning(f"ingest workers did not finish within {SHUTDOWN_DRAIN_TIMEOUT}s.")
+        logging.info(f"final ingest stats: {ingest_queue.stats()}")
+
+        logging.info("flushing pending trades to database...")
+        if not trade_writer.stop(SHUTDOWN_DRAIN_TIMEOUT):
+            logging.warning(f"trade writer did not finish within {SHUTDOWN_DRAIN_TIMEOUT}s.")
+        logging.info(f"final writer stats: {trade_writer.stats()}")
+
+    if feed_recorder is not None:
+        feed_recorder.stop()
+        logging.info(f"final feed recorder stats: {feed_recorder.stats()}")
+
 # --- main execution ---
 if __name__ == "__main__":
     # set up logging first
@@ -411,12 +1858,49 @@ if __name__ == "__main__":
         logging.error("please create a .env file with your API credentials.")
         sys.exit(1)
 
+    if ASYNC_MODE and MULTIPROCESS_MODE:
+        logging.error("error: ASYNC_MODE and MULTIPROCESS_MODE can't be combined. turn one of them off.")
+        sys.exit(1)
+
     load_whales()
     setup_database()
 
     logging.info(f"starting live trade simulator bot. this will run 24/7.")
     logging.info(f"only processing trades for active markets (not closed/resolved).")
     if DEBUG_MODE:
-        logging.info("--- debug mode is on: all live data will be logged ---")
+        logging.info(f"--- debug mode is on: 1 in {FRAME_LOG_SAMPLE_EVERY} raw frames will be logged to '{FRAME_LOG_FILE}' ---")
     logging.info("press CTRL+C to stop.")
-    start_websocket()
\ No newline at end of file
+
+    start_metrics()
+    if not MULTIPROCESS_MODE:
+        # in multiprocess mode the child processes do these for themselves
+        load_recent_trade_keys()
+        warm_market_cache()
+        trade_writer.start()
+        start_whale_watcher()
+
+    if RECORD_FEED:
+        feed_recorder = FeedRecorder(FEED_LOG_DIR / f"feed_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl.gz")
+        feed_recorder.start()
+
+    if MULTIPROCESS_MODE:
+        start_multiprocess()
+        try:
+            start_websocket()
+        except KeyboardInterrupt:
+            shutdown()
+    elif ASYNC_MODE:
+        if aiohttp is None:
+            logging.error("error: ASYNC_MODE needs aiohttp. run 'pip install aiohttp'.")
+            sys.exit(1)
+        logging.info("--- async mode: using aiohttp for the websocket and market lookups ---")
+        try:
+            asyncio.run(run_async())
+        except KeyboardInterrupt:
+            shutdown()
+    else:
+        ingest_queue.start_workers(NUM_WORKERS, process_message)
+        try:
+            start_websocket()
+        except KeyboardInterrupt:
+            shutdown()
\ No newline at end of file
@@ -0,0 +1,165 @@
+import ast
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from migrations import migrate
+
+# --- config ---
+DATABASE_FILE = Path("~/IdeaProjects/PolyCopy/db/simulation.db").expanduser()
+MARKETS_FILE = Path("~/IdeaProjects/PolyCopy/preprocessing/scalar_trading/markets_with_groups_v2.csv").expanduser()
+LOOKUP_CHUNK_SIZE = 500  # condition ids per IN (...) query, well under sqlite's variable limit
+
+# market metadata shared by the simulator, the daily analyzer and the dashboard.
+# the markets table itself is created by migrations.py.
+
+# api fields overwrite what we had, except that a missing value never erases a known one
+UPSERT_SQL = '''
+             INSERT INTO markets (condition_id, question, end_date, closed, resolution_status, outcomes, final_prices, updated_at)
+             VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                 ON CONFLICT(condition_id) DO UPDATE SET
+                     question = COALESCE(excluded.question, markets.question),
+                     end_date = COALESCE(excluded.end_date, markets.end_date),
+                     closed = excluded.closed,
+                     resolution_status = COALESCE(excluded.resolution_status, markets.resolution_status),
+                     outcomes = COALESCE(excluded.outcomes, markets.outcomes),
+                     final_prices = COALESCE(excluded.final_prices, markets.final_prices),
+                     updated_at = CURRENT_TIMESTAMP
+             '''
+
+# the groups file only fills in what the api hasn't told us yet (plus the group itself)
+GROUP_UPSERT_SQL = '''
+                   INSERT INTO markets (condition_id, question, closed, outcomes, final_prices, market_group)
+                   VALUES (?, ?, 1, ?, ?, ?)
+                       ON CONFLICT(condition_id) DO UPDATE SET
+                           market_group = excluded.market_group,
+                           question = COALESCE(markets.question, excluded.question),
+                           outcomes = COALESCE(markets.outcomes, excluded.outcomes),
+                           final_prices = COALESCE(markets.final_prices, excluded.final_prices)
+                   '''
+
+
+def _json_list(value):
+    """
+    outcomes/prices come back as a json string or a list (and as a python
+    list repr from the preprocessing csvs); returns a list or none.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            try:
+                value = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                return None
+    return value if isinstance(value, list) else None
+
+
+def _json_text(value):
+    value = _json_list(value)
+    return json.dumps(value) if value else None
+
+
+def market_row(market):
+    """
+    converts one market from the gamma /markets api into a row for UPSERT_SQL.
+    prices are only stored as final once the market is closed.
+    """
+    closed = bool(market.get('closed', False))
+    return (
+        market.get('conditionId'),
+        market.get('question'),
+        market.get('endDate'),
+        int(closed),
+        market.get('umaResolutionStatus'),
+        _json_text(market.get('outcomes')),
+        _json_text(market.get('outcomePrices')) if closed else None,
+    )
+
+
+def upsert_markets(conn, markets):
+    """upserts api market dicts. the caller commits."""
+    rows = [market_row(m) for m in markets if m.get('conditionId')]
+    if rows:
+        conn.executemany(UPSERT_SQL, rows)
+    return len(rows)
+
+
+def row_to_market(row):
+    """
+    turns a markets-table row back into the shape the gamma api uses, so code
+    written against api responses works unchanged on stored markets.
+    """
+    condition_id, question, end_date, closed, resolution_status, outcomes, final_prices, market_group = row
+    return {
+        'conditionId': condition_id,
+        'question': question,
+        'endDate': end_date,
+        'closed': bool(closed),
+        'umaResolutionStatus': resolution_status,
+        'outcomes': outcomes,
+        'outcomePrices': final_prices,
+        'market_group': market_group,
+    }
+
+
+def load_markets(conn, condition_ids, max_age=None):
+    """
+    returns {condition_id: market} for the stored markets among condition_ids,
+    in api shape. with max_age (seconds), open markets refreshed longer ago than
+    that are left out; closed markets don't change, so they are always returned.
+    """
+    condition_ids = list(condition_ids)
+    markets = {}
+    for i in range(0, len(condition_ids), LOOKUP_CHUNK_SIZE):
+        chunk = condition_ids[i : i + LOOKUP_CHUNK_SIZE]
+        query = f'''
+                SELECT condition_id, question, end_date, closed, resolution_status, outcomes, final_prices, market_group
+                FROM markets
+                WHERE condition_id IN ({",".join("?" * len(chunk))})
+                '''
+        params = list(chunk)
+        if max_age is not None:
+            query += " AND (closed = 1 OR updated_at >= datetime('now', ?))"
+            params.append(f"-{int(max_age)} seconds")
+        for row in conn.execute(query, params):
+            markets[row[0]] = row_to_market(row)
+    return markets
+
+
+def import_market_groups(conn, csv_path=MARKETS_FILE):
+    """
+    loads market_group (and question/outcomes/final prices where missing) from
+    the preprocessing groups file into the markets table. returns rows imported.
+    """
+    df = pd.read_csv(csv_path)
+    df = df.dropna(subset=['conditionId'])
+    df = df.astype(object).where(df.notna(), None)
+    rows = [
+        (r['conditionId'], r.get('question'), _json_text(r.get('outcomes')), _json_text(r.get('final_prices')),
+         r.get('market_group'))
+        for r in df.to_dict('records')
+    ]
+    conn.executemany(GROUP_UPSERT_SQL, rows)
+    conn.commit()
+    return len(rows)
+
+
+def main():
+    """python market_store.py [groups.csv] -- imports market groups into simulation.db"""
+    csv_path = Path(sys.argv[1]).expanduser() if len(sys.argv) > 1 else MARKETS_FILE
+    if not csv_path.exists():
+        print(f"error: groups file '{csv_path}' not found.")
+        sys.exit(1)
+    conn = sqlite3.connect(DATABASE_FILE)
+    migrate(conn)
+    count = import_market_groups(conn, csv_path)
+    conn.close()
+    print(f"imported {count} markets from '{csv_path}' into '{DATABASE_FILE}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+import sqlite3
+
+# every script that opens simulation.db calls migrate() first, so the simulator,
+# the daily analyzer and the dashboard always agree on the schema. to change the
+# schema, append a migration with the next version number -- never edit one
+# that has shipped, databases out there have already applied it.
+
+SCHEMA_VERSION_TABLE_SQL = '''
+                           CREATE TABLE IF NOT EXISTS schema_version (
+                                                                        version INTEGER PRIMARY KEY,
+                                                                        description TEXT NOT NULL,
+                                                                        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                           )
+                           '''
+
+TRADES_TABLE_SQL = '''
+                   CREATE TABLE IF NOT EXISTS trades (
+                                                         id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                                                         whale_wallet TEXT NOT NULL,
+                                                         market_id TEXT NOT NULL,
+                                                         question TEXT,
+                                                         outcome TEXT NOT NULL,
+                                                         side TEXT NOT NULL,
+                                                         price REAL NOT NULL,
+                                                         simulated_bet REAL NOT NULL,
+                                                         is_resolved INTEGER DEFAULT 0,
+                                                         pnl REAL DEFAULT 0
+                   )
+                   '''
+
+PNL_HISTORY_TABLE_SQL = '''
+                        CREATE TABLE IF NOT EXISTS pnl_history (
+                                                                   id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                                   timestamp DATE UNIQUE,
+                                                                   cumulative_pnl REAL NOT NULL
+                        )
+                        '''
+
+# one row per market, keyed by conditionId (see market_store.py)
+MARKETS_TABLE_SQL = '''
+                    CREATE TABLE IF NOT EXISTS markets (
+                                                           condition_id TEXT PRIMARY KEY,
+                                                           question TEXT,
+                                                           end_date TEXT,
+                                                           closed INTEGER DEFAULT 0,
+                                                           resolution_status TEXT,
+                                                           outcomes TEXT,
+                                                           final_prices TEXT,
+                                                           market_group TEXT,
+                                                           updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                    '''
+
+# the timing columns record how stale each simulated copy was when logged
+TRADE_COLUMNS_V2 = ["question TEXT", "exchange_ts REAL", "received_ts REAL", "metadata_ms REAL",
+                    "detect_latency_ms REAL", "copy_latency_ms REAL", "tx_hash TEXT"]
+
+
+# running per-wallet totals, kept current by triggers on the trades table so the
+# leaderboards and reports read one row per whale instead of aggregating every trade.
+# wins and losses count resolved trades with pnl above and below zero.
+WHALE_STATS_TABLE_SQL = '''
+                        CREATE TABLE IF NOT EXISTS whale_stats (
+                                                                   whale_wallet TEXT PRIMARY KEY,
+                                                                   resolved_pnl REAL NOT NULL DEFAULT 0,
+                                                                   resolved_count INTEGER NOT NULL DEFAULT 0,
+                                                                   wins INTEGER NOT NULL DEFAULT 0,
+                                                                   losses INTEGER NOT NULL DEFAULT 0,
+                                                                   open_count INTEGER NOT NULL DEFAULT 0,
+                                                                   invested REAL NOT NULL DEFAULT 0
+                        )
+                        '''
+
+# what one trade row adds to its wallet's totals, in WHALE_STATS_TABLE_SQL column order
+_WHALE_STATS_TERMS = (
+    "CASE WHEN {r}.is_resolved = 1 THEN COALESCE({r}.pnl, 0) ELSE 0 END",
+    "({r}.is_resolved = 1)",
+    "({r}.is_resolved = 1 AND {r}.pnl > 0)",
+    "({r}.is_resolved = 1 AND {r}.pnl < 0)",
+    "({r}.is_resolved = 0)",
+    "{r}.simulated_bet",
+)
+_WHALE_STATS_COLUMNS = ("resolved_pnl", "resolved_count", "wins", "losses", "open_count", "invested")
+
+
+# realized p&l, invested amount and trade counts per (trade day, market group), kept
+# current by triggers on trades and markets so the dashboard charts read a few rows
+# per day however long the history gets. trades in ungrouped markets go under ''.
+PNL_ROLLUP_TABLE_SQL = '''
+                       CREATE TABLE IF NOT EXISTS pnl_rollup (
+                                                                 day TEXT NOT NULL,
+                                                                 market_group TEXT NOT NULL DEFAULT '',
+                                                                 realized_pnl REAL NOT NULL DEFAULT 0,
+                                                                 resolved_count INTEGER NOT NULL DEFAULT 0,
+                                                                 trade_count INTEGER NOT NULL DEFAULT 0,
+                                                                 invested REAL NOT NULL DEFAULT 0,
+                                                                 PRIMARY KEY (day, market_group)
+                       )
+                       '''
+
+# what one trade row adds to its (day, group) bucket, in PNL_ROLLUP_TABLE_SQL column order
+_PNL_ROLLUP_TERMS = (
+    "CASE WHEN {r}.is_resolved = 1 THEN COALESCE({r}.pnl, 0) ELSE 0 END",
+    "({r}.is_resolved = 1)",
+    "1",
+    "{r}.simulated_bet",
+)
+_PNL_ROLLUP_COLUMNS = ("realized_pnl", "resolved_count", "trade_count", "invested")
+
+
+def is_compact(conn):
+    """true if trades is the compact layout's view over trades_v2 (see compact_schema.py)."""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'trades'").fetchone()
+    return row is not None and row[0] == 'view'
+
+
+def _trade_source(conn):
+    """
+    the table that holds the trade rows (trades, or trades_v2 in the compact
+    layout) and sql templates for reading a row {r} of it: its wallet, market
+    id and day, and a filter for the rows of market {m}.
+    """
+    if is_compact(conn):
+        return "trades_v2", {
+            'wallet': "(SELECT address FROM wallets WHERE id = {r}.wallet_id)",
+            'market': "(SELECT condition_id FROM market_keys WHERE id = {r}.market_key)",
+            'day': "date({r}.ts, 'unixepoch')",
+            'in_market': "market_key = (SELECT id FROM market_keys WHERE condition_id = {m})",
+        }
+    return "trades", {
+        'wallet': "{r}.whale_wallet",
+        'market': "{r}.market_id",
+        'day': "date({r}.timestamp)",
+        'in_market': "market_id = {m}",
+    }
+
+
+def _terms(templates, r):
+    return [term.format(r=r) for term in templates]
+
+
+def _deltas(templates):
+    """per-column (new) - (old) for a trigger on update."""
+    return [f"({new}) - ({old})" for new, old in zip(_terms(templates, "NEW"), _terms(templates, "OLD"))]
+
+
+def _negated(templates, r):
+    return [f"-({term})" for term in _terms(templates, r)]
+
+
+def create_whale_stats_triggers(conn):
+    """
+    (re)creates the triggers that keep whale_stats current, on whichever table
+    holds the trade rows: trades, or trades_v2 in the compact layout.
+    """
+    table, source = _trade_source(conn)
+
+    def apply(values, r):
+        sets = ", ".join(f"{column} = {column} + {value}" for column, value in zip(_WHALE_STATS_COLUMNS, values))
+        return f"UPDATE whale_stats SET {sets} WHERE whale_wallet = {source['wallet'].format(r=r)};"
+
+    for name in ("whale_stats_insert", "whale_stats_resolve", "whale_stats_delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute(f'''
+                 CREATE TRIGGER whale_stats_insert AFTER INSERT ON {table}
+                 BEGIN
+                     INSERT OR IGNORE INTO whale_stats (whale_wallet) VALUES ({source['wallet'].format(r="NEW")});
+                     {apply(_terms(_WHALE_STATS_TERMS, "NEW"), "NEW")}
+                 END
+                 ''')
+    conn.execute(f'''
+                 CREATE TRIGGER whale_stats_resolve AFTER UPDATE OF is_resolved, pnl, simulated_bet ON {table}
+                 BEGIN
+                     {apply(_deltas(_WHALE_STATS_TERMS), "NEW")}
+                 END
+                 ''')
+    conn.execute(f'''
+                 CREATE TRIGGER whale_stats_delete AFTER DELETE ON {table}
+                 BEGIN
+                     {apply(_negated(_WHALE_STATS_TERMS, "OLD"), "OLD")}
+                 END
+                 ''')
+
+
+def _create_whale_stats(conn):
+    """creates whale_stats, fills it from the trades already stored, and adds its triggers."""
+    conn.execute(WHALE_STATS_TABLE_SQL)
+    sums = ", ".join(f"COALESCE(SUM({term}), 0)" for term in _terms(_WHALE_STATS_TERMS, "trades"))
+    conn.execute(f'''
+                 INSERT OR REPLACE INTO whale_stats (whale_wallet, {", ".join(_WHALE_STATS_COLUMNS)})
+                 SELECT whale_wallet, {sums} FROM trades GROUP BY whale_wallet
+                 ''')
+    create_whale_stats_triggers(conn)
+
+
+def _rollup_upsert(day, group, values, select=None):
+    """adds values (one per _PNL_ROLLUP_COLUMNS) into the (day, group) bucket."""
+    columns = ", ".join(_PNL_ROLLUP_COLUMNS)
+    sets = ", ".join(f"{column} = {column} + excluded.{column}" for column in _PNL_ROLLUP_COLUMNS)
+    if select is None:
+        source = f"VALUES ({day}, {group}, {', '.join(values)})"
+    else:
+        source = f"SELECT {day}, {group}, {', '.join(values)} {select}"
+    return (f"INSERT INTO pnl_rollup (day, market_group, {columns}) {source} "
+            f"ON CONFLICT(day, market_group) DO UPDATE SET {sets};")
+
+
+def create_pnl_rollup_triggers(conn):
+    """
+    (re)creates the triggers that keep pnl_rollup current: on the trade rows
+    (trades, or trades_v2 in the compact layout), and on markets, so that a
+    market getting or changing its group moves its trades' totals along.
+    """
+    table, source = _trade_source(conn)
+
+    def group_of(r):
+        market = source['market'].format(r=r)
+        return f"COALESCE((SELECT market_group FROM markets WHERE condition_id = {market}), '')"
+
+    def apply(values, r):
+        return _rollup_upsert(source['day'].format(r=r), group_of(r), values)
+
+    def move(condition_id, old_group, new_group):
+        # is_resolved IN (0, 1) lets the (is_resolved, market) index find the market's rows
+        rows = f"FROM {table} WHERE is_resolved IN (0, 1) AND {source['in_market'].format(m=condition_id)} GROUP BY 1"
+        day = source['day'].format(r=table)
+        return (_rollup_upsert(day, old_group, [f"-SUM({t})" for t in _terms(_PNL_ROLLUP_TERMS, table)], rows) +
+                _rollup_upsert(day, new_group, [f"SUM({t})" for t in _terms(_PNL_ROLLUP_TERMS, table)], rows))
+
+    for name in ("pnl_rollup_insert", "pnl_rollup_resolve", "pnl_rollup_delete",
+                 "pnl_rollup_market_insert", "pnl_rollup_market_regroup"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute(f'''
+                 CREATE TRIGGER pnl_rollup_insert AFTER INSERT ON {table}
+                 BEGIN
+                     {apply(_terms(_PNL_ROLLUP_TERMS, "NEW"), "NEW")}
+                 END
+                 ''')
+    conn.execute(f'''
+                 CREATE TRIGGER pnl_rollup_resolve AFTER UPDATE OF is_resolved, pnl, simulated_bet ON {table}
+                 BEGIN
+                     {apply(_deltas(_PNL_ROLLUP_TERMS), "NEW")}
+                 END
+                 ''')
+    conn.execute(f'''
+                 CREATE TRIGGER pnl_rollup_delete AFTER DELETE ON {table}
+                 BEGIN
+                     {apply(_negated(_PNL_ROLLUP_TERMS, "OLD"), "OLD")}
+                 END
+                 ''')
+    # trades logged before their market row existed were counted as ungrouped
+    conn.execute(f'''
+                 CREATE TRIGGER pnl_rollup_market_insert AFTER INSERT ON markets
+                 WHEN COALESCE(NEW.market_group, '') <> ''
+                 BEGIN
+                     {move("NEW.condition_id", "''", "NEW.market_group")}
+                 END
+                 ''')
+    conn.execute(f'''
+                 CREATE TRIGGER pnl_rollup_market_regroup AFTER UPDATE OF market_group ON markets
+                 WHEN COALESCE(OLD.market_group, '') <> COALESCE(NEW.market_group, '')
+                 BEGIN
+                     {move("NEW.condition_id", "COALESCE(OLD.market_group, '')", "COALESCE(NEW.market_group, '')")}
+                 END
+                 ''')
+
+
+def _create_pnl_rollup(conn):
+    """creates pnl_rollup, fills it from the trades already stored, and adds its triggers."""
+    conn.execute(PNL_ROLLUP_TABLE_SQL)
+    sums = ", ".join(f"COALESCE(SUM({term}), 0)" for term in _terms(_PNL_ROLLUP_TERMS, "t"))
+    conn.execute(f'''
+                 INSERT OR REPLACE INTO pnl_rollup (day, market_group, {", ".join(_PNL_ROLLUP_COLUMNS)})
+                 SELECT date(t.timestamp), COALESCE(m.market_group, ''), {sums}
+                 FROM trades t
+                          LEFT JOIN markets m ON m.condition_id = t.market_id
+                 GROUP BY 1, 2
+                 ''')
+    create_pnl_rollup_triggers(conn)
+
+
+# a version number per table that readers cache on, bumped by triggers, so a reader
+# can tell the table changed without scanning it (see get_change_tokens in dashboard.py).
+CHANGE_COUNTERS_TABLE_SQL = '''
+                            CREATE TABLE IF NOT EXISTS change_counters (
+                                                                           name TEXT PRIMARY KEY,
+                                                                           version INTEGER NOT NULL DEFAULT 0
+                            )
+                            '''
+
+# the markets columns the dashboard shows. the simulator refreshes markets all the
+# time, but a refresh that leaves these alone (updated_at, closed, the check
+# schedule) doesn't bump the counter.
+_MARKETS_SHOWN_COLUMNS = ("question", "market_group")
+
+
+# keyset paging of the position tables walks trades newest first by (timestamp, id).
+# on the plain table the (is_resolved, timestamp, pnl) index ends in the rowid and is
+# enough, but through the compact layout's view the planner only keeps that order
+# (rather than sorting every match) with an index that has id right after the timestamp.
+POSITION_INDEX_V2_SQL = "CREATE INDEX IF NOT EXISTS idx_trades_v2_resolved_ts_id ON trades_v2 (is_resolved, datetime(ts, 'unixepoch'), id)"
+
+
+def create_summary_triggers(conn):
+    """(re)creates the triggers of every trigger-maintained summary table."""
+    create_whale_stats_triggers(conn)
+    create_pnl_rollup_triggers(conn)
+
+
+def _create_markets_counter(conn):
+    """creates the markets change counter and the triggers that bump it."""
+    conn.execute(CHANGE_COUNTERS_TABLE_SQL)
+    conn.execute("INSERT OR IGNORE INTO change_counters (name) VALUES ('markets')")
+    bump = "UPDATE change_counters SET version = version + 1 WHERE name = 'markets';"
+    changed = " OR ".join(f"OLD.{column} IS NOT NEW.{column}" for column in _MARKETS_SHOWN_COLUMNS)
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS markets_counter_insert AFTER INSERT ON markets BEGIN {bump} END")
+    conn.execute(f'''
+                 CREATE TRIGGER IF NOT EXISTS markets_counter_update AFTER UPDATE OF {", ".join(_MARKETS_SHOWN_COLUMNS)} ON markets
+                 WHEN {changed}
+                 BEGIN
+                     {bump}
+                 END
+                 ''')
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS markets_counter_delete AFTER DELETE ON markets BEGIN {bump} END")
+
+
+def _add_compact_position_index(conn):
+    """adds POSITION_INDEX_V2_SQL to databases already converted to the compact layout."""
+    if is_compact(conn):
+        conn.execute(POSITION_INDEX_V2_SQL)
+        conn.execute("ANALYZE trades_v2")
+
+
+def _add_trade_columns(conn):
+    """
+    adds the columns newer versions write. databases from before migrations
+    existed may already have some of them, so only the missing ones are added.
+    """
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(trades)")}
+    for column_def in TRADE_COLUMNS_V2:
+        if column_def.split()[0] not in existing:
+            conn.execute(f"ALTER TABLE trades ADD COLUMN {column_def}")
+
+
+# (version, description, steps). a step is a sql statement or a function taking the connection.
+# version 1 uses IF NOT EXISTS throughout, so it also adopts databases created before this table.
+MIGRATIONS = [
+    (1, "base trades and pnl_history tables", [TRADES_TABLE_SQL, PNL_HISTORY_TABLE_SQL]),
+    (2, "trade timing and tx_hash columns", [_add_trade_columns]),
+    (3, "markets table", [MARKETS_TABLE_SQL]),
+    # one row per fill leg. older rows have no tx_hash, and nulls never collide.
+    (4, "unique fill index", ["CREATE UNIQUE INDEX IF NOT EXISTS idx_trades_tx_wallet ON trades (tx_hash, whale_wallet)"]),
+    # each index carries the columns its queries read, so they are answered from the index alone:
+    #   open/closed positions and the p&l series filter on is_resolved and sort by timestamp,
+    #   the leaderboard and whale deep-dive group or filter by wallet and sum pnl,
+    #   the open-market scans read distinct market_ids of unresolved trades,
+    #   the dedup warm-up and invested-per-day reads range over timestamp.
+    (5, "indexes for dashboard and analyzer access paths", [
+        "CREATE INDEX IF NOT EXISTS idx_trades_resolved_ts ON trades (is_resolved, timestamp, pnl)",
+        "CREATE INDEX IF NOT EXISTS idx_trades_wallet ON trades (whale_wallet, is_resolved, timestamp, pnl)",
+        "CREATE INDEX IF NOT EXISTS idx_trades_resolved_market ON trades (is_resolved, market_id)",
+        "CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades (timestamp, simulated_bet)",
+        "ANALYZE",
+    ]),
+    # when daily_analyzer should next ask the api about a market (see its scheduler)
+    (6, "resolution check schedule on markets", [
+        "ALTER TABLE markets ADD COLUMN next_check_at REAL",
+        "ALTER TABLE markets ADD COLUMN check_attempts INTEGER DEFAULT 0",
+    ]),
+    (7, "whale_stats running totals", [_create_whale_stats]),
+    (8, "daily p&l rollup by market group", [_create_pnl_rollup]),
+    (9, "markets change counter", [_create_markets_counter]),
+    (10, "position paging index for the compact layout", [_add_compact_position_index]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    """returns the highest applied migration version, 0 for a new database."""
+    conn.execute(SCHEMA_VERSION_TABLE_SQL)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn):
+    """
+    applies every pending migration, each in its own transaction. safe to call
+    from several processes at once: the write lock is taken before the version
+    is re-read, so a migration another process just applied is skipped.
+    returns the schema version.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    version = current_version(conn)
+    for number, description, steps in MIGRATIONS:
+        if number <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if current_version(conn) >= number:
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (number, description))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return max(version, SCHEMA_VERSION)
@@ -0,0 +1,80 @@
+import numpy as np
+
+# p&l of simulated copy trades at settlement, over whole arrays of trades at once.
+# used by the daily analyzer (settling resolved markets) and the fake trade generator.
+#
+#   buy:  shares = bet / price        pnl = shares * settlement - bet
+#   sell: shares = bet / (1 - price)  pnl = shares * (1 - settlement) - bet
+#
+# a trade whose cost per share is 0 (buy at 0, sell at 1), or whose price or
+# settlement price is missing, settles at 0.
+
+
+def _factorize(values):
+    """values -> (int64 codes, distinct values in first-seen order). a dict beats np.unique on strings."""
+    positions = {}
+    codes = np.fromiter((positions.setdefault(v, len(positions)) for v in values), dtype=np.int64)
+    return codes, list(positions)
+
+
+def is_buy(sides):
+    """'BUY'/'SELL' strings (any case) -> boolean array, true for buys."""
+    codes, values = _factorize(sides)
+    return np.array([str(v).upper() == 'BUY' for v in values], dtype=bool)[codes]
+
+
+def settlement_prices(market_ids, outcomes, market_results):
+    """
+    looks up each trade's settlement price in market_results
+    ({market_id: {"outcomes": [...], "final_prices": [...]}}), matching the
+    outcome name case-insensitively; the first matching outcome wins.
+    returns a float array with nan where the market or outcome isn't found.
+
+    markets and outcome names are factorized to integer codes, so the string
+    work is per distinct value and the per-trade lookup is one searchsorted.
+    """
+    market_codes, markets = _factorize(market_ids)
+    if market_codes.size == 0:
+        return np.empty(0)
+    outcome_codes, outcome_values = _factorize(outcomes)
+    name_codes, names = _factorize(str(o).upper() for o in outcome_values)
+    name_positions = {name: i for i, name in enumerate(names)}
+
+    # (market code, outcome name code) -> final price, for the pairs trades can ask for
+    table = {}
+    for market_code, market_id in enumerate(markets):
+        result = market_results.get(market_id)
+        if not result:
+            continue
+        for outcome, price in zip(result['outcomes'], result['final_prices']):
+            name = name_positions.get(str(outcome).upper())
+            if name is not None:
+                table.setdefault(market_code * len(names) + name, price)
+    if not table:
+        return np.full(market_codes.size, np.nan)
+
+    table_keys = np.fromiter(table.keys(), dtype=np.int64, count=len(table))
+    table_prices = np.fromiter(table.values(), dtype=float, count=len(table))
+    order = np.argsort(table_keys)
+    table_keys, table_prices = table_keys[order], table_prices[order]
+
+    trade_keys = market_codes * len(names) + name_codes[outcome_codes]
+    position = np.searchsorted(table_keys, trade_keys).clip(max=table_keys.size - 1)
+    return np.where(table_keys[position] == trade_keys, table_prices[position], np.nan)
+
+
+def trade_pnl(buy, price, bet, settlement):
+    """
+    settles trades. buy is a boolean array (see is_buy); price, bet and
+    settlement are arrays or scalars. returns a float array of p&l.
+    """
+    buy = np.asarray(buy, dtype=bool)
+    price = np.asarray(price, dtype=float)
+    bet = np.asarray(bet, dtype=float)
+    settlement = np.asarray(settlement, dtype=float)
+
+    cost = np.where(buy, price, 1 - price)  # paid per share of the side we took
+    payout = np.where(buy, settlement, 1 - settlement)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pnl = bet / cost * payout - bet
+    return np.where((cost == 0) | ~np.isfinite(pnl), 0.0, pnl)
@@ -0,0 +1,152 @@
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from threading import Lock
+
+import live_trade_simulator as sim
+from feed_log import read_feed_log
+from latency import format_summaries
+
+# --- config ---
+DEFAULT_REPLAY_DB = Path("~/IdeaProjects/PolyCopy/db/replay.db").expanduser()
+
+
+class StageTimer:
+    """collects per-call durations for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.durations = []
+        self._lock = Lock()
+
+    def wrap(self, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.durations.append(elapsed)
+        return timed
+
+    def summary(self):
+        with self._lock:
+            durations = sorted(self.durations)
+        if not durations:
+            return f"{self.name:<12} calls=0"
+        n = len(durations)
+        p50 = durations[n // 2] * 1e6
+        p99 = durations[min(n - 1, int(n * 0.99))] * 1e6
+        total = sum(durations)
+        return (f"{self.name:<12} calls={n:<8} total={total:8.3f}s  "
+                f"p50={p50:10.1f}us  p99={p99:10.1f}us  max={durations[-1] * 1e6:10.1f}us")
+
+
+def instrument_pipeline():
+    """
+    wraps the simulator's stage functions with timers. the simulator looks
+    these up as module globals at call time, so the wrapped versions are used.
+    """
+    timers = {
+        'prefilter': StageTimer('prefilter'),
+        'parse': StageTimer('parse'),
+        'metadata': StageTimer('metadata'),
+        'db_commit': StageTimer('db_commit'),
+    }
+    sim.frame_mentions_whale = timers['prefilter'].wrap(sim.frame_mentions_whale)
+    sim.match_whale_trade = timers['parse'].wrap(sim.match_whale_trade)
+    sim.fetch_market_info = timers['metadata'].wrap(sim.fetch_market_info)
+    sim.trade_writer._flush = timers['db_commit'].wrap(sim.trade_writer._flush)
+    return timers
+
+
+def replay(log_path, speed):
+    """
+    feeds every recorded frame through sim.on_message, paced by the recorded
+    receive timestamps divided by speed (speed <= 0 means as fast as possible).
+    returns (frames, elapsed_seconds).
+    """
+    frames = 0
+    first_recorded = None
+    start = time.perf_counter()
+
+    for received_at, message in read_feed_log(log_path):
+        if speed > 0:
+            if first_recorded is None:
+                first_recorded = received_at
+            due = start + (received_at - first_recorded) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        sim.on_message(None, message)
+        frames += 1
+
+    return frames, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="replay a recorded websocket feed through the live simulator pipeline.")
+    parser.add_argument("log_file", type=Path, help="feed log written with RECORD_FEED = True")
+    parser.add_argument("--speed", type=float, default=0, help="1 = real time, N = N times faster, 0 = max speed (default)")
+    parser.add_argument("--db", type=Path, default=DEFAULT_REPLAY_DB, help=f"database to write detections to (default: {DEFAULT_REPLAY_DB})")
+    parser.add_argument("--whales", type=Path, default=sim.WHALE_REPORT_FILE, help="whale_report.csv to use as the watchlist")
+    parser.add_argument("--markets-url", default=sim.MARKETS_URL, help="gamma /markets endpoint (point at a local stub for offline runs)")
+    parser.add_argument("--workers", type=int, default=sim.NUM_WORKERS, help="ingest worker threads")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if not args.log_file.exists():
+        print(f"error: feed log '{args.log_file}' not found.")
+        sys.exit(1)
+
+    # point the simulator at the local replay db and the chosen endpoints
+    sim.DATABASE_FILE = args.db
+    sim.WHALE_REPORT_FILE = args.whales
+    sim.MARKETS_URL = args.markets_url
+    sim.trade_writer = sim.TradeWriter(args.db, sim.DB_BATCH_SIZE, sim.DB_FLUSH_INTERVAL_MS)
+    # replay must be lossless, so the receive side waits for the workers instead of dropping
+    sim.ingest_queue = sim.IngestQueue(sim.INGEST_QUEUE_SIZE, "block", 3600)
+
+    sim.load_whales()
+    sim.setup_database()
+    timers = instrument_pipeline()
+
+    sim.trade_writer.start()
+    sim.ingest_queue.start_workers(args.workers, sim.process_message)
+
+    speed_label = "max speed" if args.speed <= 0 else f"{args.speed:g}x"
+    print(f"replaying '{args.log_file}' at {speed_label} into '{args.db}'...")
+    start = time.perf_counter()
+    frames, receive_elapsed = replay(args.log_file, args.speed)
+
+    # wait for every queued frame and pending row, so detections are complete
+    sim.ingest_queue.drain_and_stop(sim.SHUTDOWN_DRAIN_TIMEOUT)
+    sim.trade_writer.stop(sim.SHUTDOWN_DRAIN_TIMEOUT)
+    total_elapsed = time.perf_counter() - start
+    writer_stats = sim.trade_writer.stats()
+    ingest_stats = sim.ingest_queue.stats()
+
+    print("\n--- replay results ---")
+    print(f"frames replayed:       {frames}")
+    print(f"receive loop:          {receive_elapsed:.2f}s ({frames / receive_elapsed if receive_elapsed else 0:,.0f} frames/sec)")
+    print(f"end to end (drained):  {total_elapsed:.2f}s ({frames / total_elapsed if total_elapsed else 0:,.0f} frames/sec)")
+    print(f"frames past prefilter: {ingest_stats['enqueued']} (dropped: {ingest_stats['dropped']})")
+    print(f"detections written:    {writer_stats['rows_written']} in {writer_stats['batches']} batches")
+    print(f"market cache:          {sim.market_cache.stats()}")
+    print("\nper-call stage timings:")
+    for timer in timers.values():
+        print("  " + timer.summary())
+    # feed_delay/copy_latency compare against recorded exchange times, so they
+    # only mean something for --speed 1 replays of a fresh recording
+    print("\npipeline latency (simulator histograms):")
+    for line in format_summaries(sim.latency.summaries()):
+        print("  " + line)
+
+
+if __name__ == "__main__":
+    main()